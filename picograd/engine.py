@@ -3,14 +3,58 @@ Autograd engine implementing reverse-mode auto-differentiation, aka backpropagat
 """
 
 import math
-from typing import Union, Tuple, List, Set, Callable
+import threading
+from contextlib import contextmanager
+from typing import Union, Tuple, List, Set, Callable, Iterator
 
 FloatInt = Union[float, int]
 
 
+class _GradMode(threading.local):
+    """Whether operations on Vars record the computational graph, set per thread"""
+    enabled: bool = True
+
+
+_grad_mode = _GradMode()
+
+
+def is_grad_enabled() -> bool:
+    return _grad_mode.enabled
+
+
+@contextmanager
+def no_grad() -> Iterator[None]:
+    """Context manager disabling graph construction, e.g. for evaluation or inference.
+
+    Vars computed inside the block have no children and no backward function. Only affects the current thread.
+    """
+    previous = _grad_mode.enabled
+    _grad_mode.enabled = False
+    try:
+        yield
+    finally:
+        _grad_mode.enabled = previous
+
+
+@contextmanager
+def enable_grad() -> Iterator[None]:
+    """Context manager re-enabling graph construction, e.g. inside a no_grad block. Only affects the current thread."""
+    previous = _grad_mode.enabled
+    _grad_mode.enabled = True
+    try:
+        yield
+    finally:
+        _grad_mode.enabled = previous
+
+
 class Var:
     """ stores a single scalar value and its gradient """
 
+    # Set on Vars wrapping numbers mixed into operations, whose values graph passes may fold
+    _is_const: bool = False
+    # Ordered operands of the nodes built by graph passes: the children set loses the order of e.g. a - b
+    _operands: Tuple["Var", ...] = ()
+
     def __init__(self, data: FloatInt, children: Tuple["Var", ...] = (), op: str = "",
                  label: str = "") -> None:
         self.data: FloatInt = data
@@ -18,10 +62,17 @@ class Var:
 
         # Internal variables used for autograd graph construction
         self._backward: Callable = lambda: None
-        self._prev: Set[Var] = set(children)
+        self._prev: Set[Var] = set(children) if _grad_mode.enabled else set()
         self._op: str = op  # The operation that produced this node, for graphviz / debugging / etc
         self._label: str = label
 
+    @staticmethod
+    def constant(value: FloatInt) -> "Var":
+        """Wraps a number as a constant leaf of the graph"""
+        out = Var(value)
+        out._is_const = True
+        return out
+
     @property
     def children(self):
         return self._prev
@@ -45,14 +96,15 @@ class Var:
             return f"Var(data={self.data})"
 
     def __add__(self, other: Union["Var", FloatInt]) -> "Var":
-        other = other if isinstance(other, Var) else Var(other)
+        other = other if isinstance(other, Var) else Var.constant(other)
         out = Var(self.data + other.data, children=(self, other), op="+")
 
         def _backward() -> None:
             self.grad += 1.0 * out.grad  # local_grad * global_grad -> chain rule
             other.grad += 1.0 * out.grad
 
-        out._backward = _backward
+        if _grad_mode.enabled:
+            out._backward = _backward
 
         return out
 
@@ -69,14 +121,15 @@ class Var:
         return -self + other
 
     def __mul__(self, other: Union["Var", FloatInt]) -> "Var":
-        other = other if isinstance(other, Var) else Var(other)
+        other = other if isinstance(other, Var) else Var.constant(other)
         out = Var(self.data * other.data, children=(self, other), op='*')
 
         def _backward() -> None:
             self.grad += other.data * out.grad
             other.grad += self.data * out.grad
 
-        out._backward = _backward
+        if _grad_mode.enabled:
+            out._backward = _backward
 
         return out
 
@@ -90,7 +143,8 @@ class Var:
         def _backward() -> None:
             self.grad += other * (self.data ** (other - 1)) * out.grad
 
-        out._backward = _backward
+        if _grad_mode.enabled:
+            out._backward = _backward
 
         return out
 
@@ -109,7 +163,8 @@ class Var:
         def _backward():
             self.grad += out.data * out.grad
 
-        out._backward = _backward
+        if _grad_mode.enabled:
+            out._backward = _backward
 
         return out
 
@@ -123,7 +178,8 @@ class Var:
         def _backward() -> None:
             self.grad += (1 - t ** 2) * out.grad
 
-        out._backward = _backward
+        if _grad_mode.enabled:
+            out._backward = _backward
 
         return out
 
@@ -135,7 +191,8 @@ class Var:
         def _backward() -> None:
             self.grad += (out.data > 0) * out.grad
 
-        out._backward = _backward
+        if _grad_mode.enabled:
+            out._backward = _backward
 
         return out
 
@@ -147,9 +204,10 @@ class Var:
         out = Var(s, children=(self,), op='sigmoid')
 
         def _backward() -> None:
-            self.grad += (1 - s) * out.grad
+            self.grad += s * (1 - s) * out.grad
 
-        out._backward = _backward
+        if _grad_mode.enabled:
+            out._backward = _backward
 
         return out
 
@@ -157,17 +215,7 @@ class Var:
         """Compute gradients through backpropagation"""
 
         # Topological order of all the children in the graph from left to right edges
-        topo: List[Var] = []
-        visited: Set[Var] = set()
-
-        def build_topo(node: Var) -> None:
-            if node not in visited:
-                visited.add(node)
-                for child in node._prev:
-                    build_topo(child)
-                topo.append(node)
-
-        build_topo(self)
+        topo = topological_sort([self])
 
         # Go one variable at a time and apply the chain rule to get its gradient
         self.grad = 1.0
@@ -175,6 +223,24 @@ class Var:
             node._backward()
 
 
+def topological_sort(roots: List[Var]) -> List[Var]:
+    """Nodes of the graphs leading to the roots, each node placed after all of its children"""
+
+    topo: List[Var] = []
+    visited: Set[Var] = set()
+
+    def build_topo(node: Var) -> None:
+        if node not in visited:
+            visited.add(node)
+            for child in node._prev:
+                build_topo(child)
+            topo.append(node)
+
+    for root in roots:
+        build_topo(root)
+    return topo
+
+
 if __name__ =="__main__":
     from picograd.graph_viz import ForwardGraphViz
 
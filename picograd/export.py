@@ -0,0 +1,134 @@
+"""
+Export of trained MLPs to a frozen inference artifact, and a minimal evaluator for it.
+
+The artifact is a JSON-serialisable dict holding the weights, biases and activation of every layer.
+The evaluator has no dependency on the autograd engine: it runs NumPy matmuls when NumPy is installed
+and falls back to plain Python otherwise.
+"""
+
+import json
+import math
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+if TYPE_CHECKING:
+    from picograd.nn import MLP
+
+Artifact = Dict[str, Any]
+
+ARTIFACT_FORMAT = "picograd.mlp"
+ARTIFACT_VERSION = 1
+
+
+def export_mlp(model: "MLP") -> Artifact:
+    """
+    Freezes the parameters of a model into an inference artifact
+    :param model: trained MLP, each of its layers must use a single activation. Layers wrapped in Checkpoint
+        are exported as the layers they wrap
+    :return: artifact
+    """
+
+    from picograd.nn import Checkpoint  # the evaluator itself does not depend on the autograd engine
+
+    layers = []
+    for layer in model.layers:
+        while isinstance(layer, Checkpoint):
+            layer = layer.module
+        activations = {n.activation if n.activation is not None else 'linear' for n in layer.neurons}
+        assert len(activations) == 1, f"neurons of a layer must share their activation. Got {activations}."
+        layers.append({
+            "activation": activations.pop(),
+            "weights": [[w_i.data for w_i in n.w] for n in layer.neurons],
+            "biases": [n.b.data for n in layer.neurons],
+        })
+    return {
+        "format": ARTIFACT_FORMAT,
+        "version": ARTIFACT_VERSION,
+        "in_features": len(layers[0]["weights"][0]) if layers else 0,
+        "layers": layers,
+    }
+
+
+def save_artifact(artifact: Artifact, path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(artifact, f)
+
+
+def load_artifact(path: str) -> Artifact:
+    with open(path) as f:
+        artifact = json.load(f)
+    assert artifact.get("format") == ARTIFACT_FORMAT, f"Unexpected artifact format. Got {artifact.get('format')}."
+    assert artifact.get("version") == ARTIFACT_VERSION, f"Unsupported artifact version. Got {artifact.get('version')}."
+    return artifact
+
+
+def _sigmoid(x: float) -> float:
+    if x >= 0:
+        return 1 / (1 + math.exp(-x))
+    e = math.exp(x)
+    return e / (1 + e)
+
+
+_ACTIVATIONS: Dict[str, Callable[[float], float]] = {
+    'linear': lambda x: x,
+    'relu': lambda x: 0 if x < 0 else x,
+    'tanh': math.tanh,
+    'sigmoid': _sigmoid,
+}
+
+if np is not None:
+    _NP_ACTIVATIONS = {
+        'linear': lambda x: x,
+        'relu': lambda x: np.maximum(x, 0),
+        'tanh': np.tanh,
+        'sigmoid': lambda x: 0.5 * (1 + np.tanh(x / 2)),  # stable for large inputs
+    }
+
+
+class InferenceModel:
+    """Evaluator of an exported MLP artifact"""
+
+    def __init__(self, artifact: Artifact, use_numpy: Optional[bool] = None) -> None:
+        self.use_numpy = np is not None if use_numpy is None else use_numpy
+        assert not self.use_numpy or np is not None, "NumPy is not installed"
+        self.in_features: int = artifact["in_features"]
+
+        for layer in artifact["layers"]:
+            if layer["activation"] not in _ACTIVATIONS:
+                raise NotImplementedError(
+                    f"Unexpected activation ('relu', 'tanh', 'sigmoid' and 'linear' available). Got {layer['activation']}.")
+
+        if self.use_numpy:
+            self._layers = [(np.asarray(layer["weights"], dtype=float).T, np.asarray(layer["biases"], dtype=float),
+                             _NP_ACTIVATIONS[layer["activation"]]) for layer in artifact["layers"]]
+        else:
+            self._layers = [(layer["weights"], layer["biases"], _ACTIVATIONS[layer["activation"]])
+                            for layer in artifact["layers"]]
+
+    @classmethod
+    def from_file(cls, path: str, use_numpy: Optional[bool] = None) -> "InferenceModel":
+        return cls(load_artifact(path), use_numpy=use_numpy)
+
+    def predict(self, x: Sequence[float]) -> List[float]:
+        return self.predict_batch([x])[0]
+
+    def predict_batch(self, xs: Sequence[Sequence[float]]) -> List[List[float]]:
+        for x in xs:
+            if len(x) != self.in_features:
+                raise ValueError(f"Expected samples of {self.in_features} features. Got {len(x)}.")
+
+        if self.use_numpy:
+            out = np.asarray(xs, dtype=float).reshape(len(xs), self.in_features)
+            for weights, biases, activation in self._layers:
+                out = activation(out @ weights + biases)
+            return out.tolist()
+
+        outs = [list(x) for x in xs]
+        for weights, biases, activation in self._layers:
+            outs = [[activation(sum([w_i * x_i for w_i, x_i in zip(w, x)], b)) for w, b in zip(weights, biases)]
+                    for x in outs]
+        return outs
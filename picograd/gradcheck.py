@@ -0,0 +1,130 @@
+"""
+Finite-difference gradient checking of the autograd engine.
+
+The engine is scalar, so a forward pass evaluates a single point: there is no vectorized forward to batch perturbed
+inputs into. gradcheck perturbs the inputs one at a time and reports the error of every input. directional_gradcheck
+batches the perturbation instead: each of its checks moves all the inputs at once along a seeded random direction,
+so its cost depends on the number of directions and not on the number of inputs.
+"""
+
+import random
+
+from picograd.engine import Var, no_grad
+from picograd.nn import Module
+
+from typing import Callable, List, NamedTuple, Optional, Sequence
+
+GradcheckEntry = NamedTuple("GradcheckEntry", [("name", str), ("analytic", float), ("numeric", float),
+                                               ("abs_error", float), ("rel_error", float), ("passed", bool)])
+GradcheckResult = NamedTuple("GradcheckResult", [("passed", bool), ("entries", List[GradcheckEntry])])
+
+
+def _entry(name: str, analytic_grad: float, numeric_grad: float, atol: float, rtol: float) -> GradcheckEntry:
+    abs_error = abs(analytic_grad - numeric_grad)
+    rel_error = abs_error / max(abs(numeric_grad), 1e-12)
+    return GradcheckEntry(name, analytic_grad, numeric_grad, abs_error, rel_error,
+                          abs_error <= atol + rtol * abs(numeric_grad))
+
+
+def _central_difference(fn: Callable[[], Var], inputs: Sequence[Var], direction: Sequence[float],
+                        eps: float) -> float:
+    """Derivative of fn along direction, the inputs are moved together and restored afterwards"""
+    data = [v.data for v in inputs]
+    try:
+        with no_grad():
+            for v, x, d in zip(inputs, data, direction):
+                v.data = x + eps * d
+            f_plus = fn().data
+            for v, x, d in zip(inputs, data, direction):
+                v.data = x - eps * d
+            f_minus = fn().data
+    finally:
+        # Also when fn raises on the perturbed inputs (e.g. a math domain error), parameters must not stay perturbed
+        for v, x in zip(inputs, data):
+            v.data = x
+    return (f_plus - f_minus) / (2 * eps)
+
+
+def _analytic_gradients(fn: Callable[[], Var], inputs: Sequence[Var]) -> List[float]:
+    for v in inputs:
+        v.grad = 0.0
+    fn().backward()
+    return [v.grad for v in inputs]
+
+
+def gradcheck(fn: Callable[[], Var], inputs: Sequence[Var], names: Optional[Sequence[str]] = None,
+              eps: float = 1e-6, atol: float = 1e-5, rtol: float = 1e-3) -> GradcheckResult:
+    """
+    Compares the gradients computed by backward against central differences.
+    The perturbed forward passes run under no_grad, so they evaluate values only and build no graph.
+    :param fn: builds the scalar output from the inputs, called once with backward and twice per input without
+    :param inputs: Vars with respect to which gradients are checked, their grad is overwritten
+    :param names: names of the inputs in the report, defaults to their labels or positions
+    :param eps: finite difference step
+    :param atol: absolute tolerance
+    :param rtol: tolerance relative to the numeric gradient
+    :return: GradcheckResult, with one entry per input
+    """
+
+    if names is None:
+        names = [v.label if v.label else str(ind) for ind, v in enumerate(inputs)]
+    assert len(names) == len(inputs), "length of names does not match the length of inputs"
+
+    analytic = _analytic_gradients(fn, inputs)
+    entries = [_entry(name, analytic_grad, _central_difference(fn, [v], [1.0], eps), atol, rtol)
+               for name, v, analytic_grad in zip(names, inputs, analytic)]
+
+    return GradcheckResult(all(entry.passed for entry in entries), entries)
+
+
+def directional_gradcheck(fn: Callable[[], Var], inputs: Sequence[Var], num_directions: int = 4, seed: int = 0,
+                          eps: float = 1e-6, atol: float = 1e-5, rtol: float = 1e-3) -> GradcheckResult:
+    """
+    Compares the gradients computed by backward against central differences along random directions.
+    Every direction perturbs all the inputs at once, so a check costs two forward passes whatever the number of
+    inputs. An error on any input changes the directional derivative, but is not attributed to that input:
+    use gradcheck to locate it.
+    :param fn: builds the scalar output from the inputs, called once with backward and twice per direction without
+    :param inputs: Vars with respect to which gradients are checked, their grad is overwritten
+    :param num_directions: number of random directions, each with components drawn from {-1, 1}
+    :param seed: seed of the directions, so that a failing check can be reproduced
+    :param eps: finite difference step
+    :param atol: absolute tolerance
+    :param rtol: tolerance relative to the numeric directional derivative
+    :return: GradcheckResult, with one entry per direction named 'direction.<k>'
+    """
+
+    rng = random.Random(seed)
+    analytic = _analytic_gradients(fn, inputs)
+    entries = []
+    for k in range(num_directions):
+        direction = [rng.choice((-1.0, 1.0)) for _ in inputs]
+        analytic_derivative = sum([g * d for g, d in zip(analytic, direction)], 0.0)
+        entries.append(_entry(f"direction.{k}", analytic_derivative, _central_difference(fn, inputs, direction, eps),
+                              atol, rtol))
+
+    return GradcheckResult(all(entry.passed for entry in entries), entries)
+
+
+def gradcheck_module(module: Module, x: Sequence[Var], num_directions: Optional[int] = None,
+                     **kwargs) -> GradcheckResult:
+    """
+    Gradient check of a module with respect to its parameters and inputs.
+    The outputs are reduced to a scalar with distinct weights, so that an error on any output shows.
+    :param module: module to check
+    :param x: input sample
+    :param num_directions: if given, runs directional_gradcheck with that many directions instead of gradcheck
+    :param kwargs: tolerances, and seed for directional_gradcheck
+    :return: GradcheckResult, entries named after the parameters and 'input.<i>' for the inputs,
+        or after the directions
+    """
+
+    def fn() -> Var:
+        return sum([(ind + 1) * out for ind, out in enumerate(module(x))], 0.0)
+
+    named = module.named_parameters()
+    inputs = [p for _, p in named] + list(x)
+    if num_directions is not None:
+        return directional_gradcheck(fn, inputs, num_directions=num_directions, **kwargs)
+    names = [name for name, _ in named] + [f"input.{ind}" for ind in range(len(x))]
+    return gradcheck(fn, inputs, names=names, **kwargs)
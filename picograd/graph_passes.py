@@ -0,0 +1,173 @@
+"""
+Optimization passes over a captured computational graph: constant folding, fusion of negation, subtraction
+and division into single nodes, and common-subexpression elimination.
+"""
+
+import math
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from picograd.engine import Var, topological_sort
+
+# Forward function and local gradients (given operand values and output value) of each op the passes rebuild
+_Op = Tuple[Callable[..., float], Callable[..., Tuple[float, ...]]]
+
+_BINARY_OPS: Dict[str, _Op] = {
+    '+': (lambda a, b: a + b, lambda a, b, out: (1.0, 1.0)),
+    '*': (lambda a, b: a * b, lambda a, b, out: (b, a)),
+    '-': (lambda a, b: a - b, lambda a, b, out: (1.0, -1.0)),
+    '/': (lambda a, b: a / b, lambda a, b, out: (1 / b, -a / b ** 2)),
+}
+
+_UNARY_OPS: Dict[str, _Op] = {
+    'neg': (lambda a: -a, lambda a, out: (-1.0,)),
+    'exp': (math.exp, lambda a, out: (out,)),
+    'tanh': (math.tanh, lambda a, out: (1 - out ** 2,)),
+    'ReLU': (lambda a: 0 if a < 0 else a, lambda a, out: (float(out > 0),)),
+    'sigmoid': (lambda a: 1 / (1 + math.exp(-a)), lambda a, out: (out * (1 - out),)),
+}
+
+_COMMUTATIVE_OPS = {'+', '*'}
+
+
+def _power(exponent: float) -> _Op:
+    return (lambda a: a ** exponent, lambda a, out: (exponent * a ** (exponent - 1),))
+
+
+def _exponent(op: str) -> Optional[float]:
+    """Exponent of a power op, e.g. -1 for both '**-1' and '**-1.0'"""
+    if not op.startswith('**'):
+        return None
+    exponent = float(op[2:])
+    return int(exponent) if exponent.is_integer() else exponent
+
+
+def _parse_op(op: str) -> Optional[_Op]:
+    if op in _BINARY_OPS:
+        return _BINARY_OPS[op]
+    if op in _UNARY_OPS:
+        return _UNARY_OPS[op]
+    exponent = _exponent(op)
+    if exponent is not None:
+        return _power(exponent)
+    return None
+
+
+def count_nodes(root: Var) -> int:
+    """Number of nodes in the graph leading to root"""
+    return len(topological_sort([root]))
+
+
+class _GraphOptimizer:
+    """Rebuilds a graph bottom-up, applying the enabled rewrites to every node"""
+
+    def __init__(self, fold_constants: bool, fuse: bool, eliminate_common_subexpressions: bool) -> None:
+        self.fold_constants = fold_constants
+        self.fuse = fuse
+        self.eliminate_common_subexpressions = eliminate_common_subexpressions
+        self._subexpressions: Dict[tuple, Var] = {}
+
+    def run(self, root: Var) -> Var:
+        rebuilt: Dict[Var, Var] = {}
+        for node in topological_sort([root]):
+            op = _parse_op(node.op) if node.children else None
+            if not node.children:
+                rebuilt[node] = self._leaf(node)
+            elif op is None:
+                # Unknown ops (e.g. fused losses) are kept as they are, along with the graph below them
+                rebuilt[node] = node
+            else:
+                # Nodes built by a previous pass keep their operands in order, e.g. for a - b
+                operand_sources = list(node._operands) if node._operands else list(node.children)
+                if node.op in _BINARY_OPS and len(operand_sources) == 1:
+                    # A binary op applied twice to the same Var (e.g. x * x) has a single child
+                    operand_sources = operand_sources * 2
+                operands = [rebuilt[c] for c in operand_sources]
+                unchanged = all(o is c for o, c in zip(operands, operand_sources))
+                rebuilt[node] = self._rewrite(node.op, operands, node if unchanged else None)
+
+        new_root = rebuilt[root]
+        # Reused intermediate nodes may hold gradients from a previous backward pass
+        for node in topological_sort([new_root]):
+            if node.children:
+                node.grad = 0.0
+        return new_root
+
+    def _leaf(self, node: Var) -> Var:
+        if self.eliminate_common_subexpressions and node._is_const:
+            return self._subexpressions.setdefault(('const', node.data), node)
+        return node
+
+    def _constant(self, value: float) -> Var:
+        return self._leaf(Var.constant(value))
+
+    def _rewrite(self, op: str, operands: List[Var], original: Optional[Var]) -> Var:
+        if self.fold_constants and all(o._is_const for o in operands):
+            return self._constant(_parse_op(op)[0](*(o.data for o in operands)))
+
+        if self.fuse and op in ('+', '*'):
+            fused = self._fuse(op, operands)
+            if fused is not None:
+                return fused
+        return self._node(op, operands, original)
+
+    def _fuse(self, op: str, operands: List[Var]) -> Optional[Var]:
+        """Rewrites the expansions of negation, subtraction and division into single nodes"""
+        for ind, operand in enumerate(operands):
+            other = operands[1 - ind]
+            if op == '*' and operand._is_const and operand.data == -1:  # x * -1 -> neg(x)
+                return self._node('neg', [other])
+            if op == '*' and operand._is_const and operand.data == 1:  # x * 1 -> x
+                return other
+            if op == '+' and operand._is_const and operand.data == 0:  # x + 0 -> x
+                return other
+        for ind, operand in enumerate(operands):
+            other = operands[1 - ind]
+            if op == '+' and operand.op == 'neg':  # a + neg(b) -> a - b
+                return self._node('-', [other, next(iter(operand.children))])
+            if op == '*' and _exponent(operand.op) == -1:  # a * b ** -1 -> a / b
+                return self._node('/', [other, next(iter(operand.children))])
+        return None
+
+    def _node(self, op: str, operands: Sequence[Var], original: Optional[Var] = None) -> Var:
+        key = None
+        if self.eliminate_common_subexpressions:
+            ids = tuple(id(o) for o in operands)
+            key = (op, tuple(sorted(ids)) if op in _COMMUTATIVE_OPS else ids)
+            if key in self._subexpressions:
+                return self._subexpressions[key]
+
+        if original is not None:
+            out = original
+        else:
+            forward, local_grads = _parse_op(op)
+            values = [o.data for o in operands]
+            out = Var(forward(*values), children=tuple(operands), op=op)
+            out._operands = tuple(operands)
+            grads = local_grads(*values, out.data)
+
+            def _backward() -> None:
+                for operand, local_grad in zip(operands, grads):
+                    operand.grad += local_grad * out.grad
+
+            out._backward = _backward
+
+        if key is not None:
+            self._subexpressions[key] = out
+        return out
+
+
+def optimize(root: Var, fold_constants: bool = True, fuse: bool = True,
+             eliminate_common_subexpressions: bool = True) -> Var:
+    """
+    Optimizes the graph leading to root. The leaves of the graph are kept, so calling backward on the
+    returned root accumulates the same gradients into them as the original graph would.
+    Optimize before calling backward on the original graph: reused intermediate nodes get their gradient reset.
+    :param root: root node of the captured graph, e.g. a loss
+    :param fold_constants: evaluate nodes whose operands are all constants
+    :param fuse: fuse negation, subtraction and division into single nodes, drop multiplications by one
+        and additions of zero
+    :param eliminate_common_subexpressions: share nodes applying the same op to the same operands
+    :return: root of the optimized graph
+    """
+
+    return _GraphOptimizer(fold_constants, fuse, eliminate_common_subexpressions).run(root)
@@ -13,6 +13,7 @@ class ComputationalGraphViz(ABC):
         Performing depth-first-search over the computational graph, ComputationalGraphViz
         is able to build a trace from a root node. Usually the root node
         is simply the final result of an operation. For MLP, it is usually the loss function.
+        Every call to create_graph starts from a fresh trace, instances must not be shared across threads.
     """
 
     def __init__(self):
@@ -27,6 +28,8 @@ class ComputationalGraphViz(ABC):
         :return: Digraph
         """
 
+        self._nodes = set()
+        self._edges = set()
         self._build_trace(root)
         graph = self._build_graph(rankdir=rankdir)
         return graph
@@ -1,19 +1,295 @@
-from picograd.engine import Var
+import math
+from abc import ABC, abstractmethod
+from picograd.engine import Var, FloatInt, is_grad_enabled
 
-from typing import List
+from typing import Callable, Sequence, Tuple, Union
 
+# Targets and predictions can be given as Vars or as plain numbers (e.g. a NumPy array)
+Values = Sequence[Union[Var, FloatInt]]
 
-def mean_squared_error(y_true: List[Var], y_pred: List[Var]) -> Var:
-    """MSE loss"""
+
+def _value(x: Union[Var, FloatInt]) -> float:
+    return x.data if isinstance(x, Var) else x
+
+
+def _vars(*sequences: Values) -> Tuple[Var, ...]:
+    return tuple(x for seq in sequences for x in seq if isinstance(x, Var))
+
+
+def mean_squared_error(y_true: Values, y_pred: Values) -> Var:
+    """MSE loss, computed as a single node of the computational graph"""
     assert len(y_true) == len(y_pred)
-    total_squared_error = sum([(y_true_i - y_pred_i) ** 2 for y_true_i, y_pred_i in zip(y_true, y_pred)], 0.0)
     n_total = max(len(y_true), 1)
-    return total_squared_error / n_total
+    diffs = [_value(y_true_i) - _value(y_pred_i) for y_true_i, y_pred_i in zip(y_true, y_pred)]
+    out = Var(sum([d * d for d in diffs], 0.0) / n_total, children=_vars(y_true, y_pred), op='mse')
 
+    def _backward() -> None:
+        for d, y_true_i, y_pred_i in zip(diffs, y_true, y_pred):
+            grad = 2 * d / n_total * out.grad
+            if isinstance(y_true_i, Var):
+                y_true_i.grad += grad
+            if isinstance(y_pred_i, Var):
+                y_pred_i.grad -= grad
 
-def binary_accuracy(y_true: List[Var], y_pred: List[Var]) -> float:
-    """Binary accuracy"""
+    if is_grad_enabled():
+        out._backward = _backward
+
+    return out
+
+
+def binary_cross_entropy(y_true: Values, y_pred: Values, eps: float = 1e-7) -> Var:
+    """Log loss for predicted probabilities in [0, 1], computed as a single node. Targets are treated as constants."""
+    assert len(y_true) == len(y_pred)
+    n_total = max(len(y_true), 1)
+    targets = [_value(y_true_i) for y_true_i in y_true]
+    probs = [min(max(_value(y_pred_i), eps), 1 - eps) for y_pred_i in y_pred]
+    loss = -sum([t * math.log(p) + (1 - t) * math.log(1 - p) for t, p in zip(targets, probs)], 0.0) / n_total
+    out = Var(loss, children=_vars(y_pred), op='bce')
+
+    def _backward() -> None:
+        for t, p, y_pred_i in zip(targets, probs, y_pred):
+            if isinstance(y_pred_i, Var):
+                y_pred_i.grad += (p - t) / (p * (1 - p)) / n_total * out.grad
+
+    if is_grad_enabled():
+        out._backward = _backward
+
+    return out
+
+
+def hinge_loss(y_true: Values, y_pred: Values) -> Var:
+    """Hinge loss for targets in {-1, 1} and raw scores, computed as a single node. Targets are treated as constants."""
+    assert len(y_true) == len(y_pred)
+    n_total = max(len(y_true), 1)
+    targets = [_value(y_true_i) for y_true_i in y_true]
+    margins = [1 - t * _value(y_pred_i) for t, y_pred_i in zip(targets, y_pred)]
+    out = Var(sum([max(m, 0.0) for m in margins], 0.0) / n_total, children=_vars(y_pred), op='hinge')
+
+    def _backward() -> None:
+        for t, m, y_pred_i in zip(targets, margins, y_pred):
+            if m > 0 and isinstance(y_pred_i, Var):
+                y_pred_i.grad -= t / n_total * out.grad
+
+    if is_grad_enabled():
+        out._backward = _backward
+
+    return out
+
+
+def _n_exact(y_true: Values, y_pred: Values) -> int:
+    """Number of predictions which round to their target"""
+    assert len(y_true) == len(y_pred)
+    return sum([_value(y_true_i) == round(_value(y_pred_i)) for y_true_i, y_pred_i in zip(y_true, y_pred)], 0)
+
+
+def softmax_cross_entropy(y_true: Values, y_pred: Sequence[Values]) -> Var:
+    """
+    Softmax followed by cross-entropy, fused into a single numerically stable node
+    :param y_true: class index of each sample
+    :param y_pred: vector of logits of each sample
+    :return: mean cross-entropy
+    """
     assert len(y_true) == len(y_pred)
-    n_exact = sum([y_true_i.data == round(y_pred_i.data) for y_true_i, y_pred_i in zip(y_true, y_pred)], 0)
+    n_total = max(len(y_true), 1)
+    classes = [int(_value(y_true_i)) for y_true_i in y_true]
+    probs = []
+    loss = 0.0
+    for k, logits in zip(classes, y_pred):
+        values = [_value(logit) for logit in logits]
+        assert 0 <= k < len(values), f"class index {k} out of range for {len(values)} logits"
+        # Shift by the max logit so that exp cannot overflow
+        shift = max(values)
+        exps = [math.exp(v - shift) for v in values]
+        total = sum(exps)
+        probs.append([e / total for e in exps])
+        loss += shift + math.log(total) - values[k]
+    out = Var(loss / n_total, children=_vars(*y_pred), op='softmax_ce')
+
+    def _backward() -> None:
+        for k, logits, sample_probs in zip(classes, y_pred, probs):
+            for j, (logit, p) in enumerate(zip(logits, sample_probs)):
+                if isinstance(logit, Var):
+                    logit.grad += (p - (j == k)) / n_total * out.grad
+
+    if is_grad_enabled():
+        out._backward = _backward
+
+    return out
+
+
+def binary_accuracy(y_true: Values, y_pred: Values) -> float:
+    """Binary accuracy"""
+    n_exact = _n_exact(y_true, y_pred)
     n_total = max(len(y_true), 1)
     return n_exact / n_total
+
+
+def _n_correct_classes(y_true: Values, y_pred: Sequence[Values]) -> int:
+    """Number of samples whose highest scoring class is their target class"""
+    assert len(y_true) == len(y_pred)
+    n_correct = 0
+    for y_true_i, y_pred_i in zip(y_true, y_pred):
+        values = [_value(v) for v in y_pred_i]
+        n_correct += values.index(max(values)) == int(_value(y_true_i))
+    return n_correct
+
+
+def categorical_accuracy(y_true: Values, y_pred: Sequence[Values]) -> float:
+    """Accuracy of the class predictions, y_true holding class indices and y_pred vectors of class scores"""
+    return _n_correct_classes(y_true, y_pred) / max(len(y_true), 1)
+
+
+def _confusion(y_true: Values, y_pred: Values, threshold: float) -> Tuple[int, int, int]:
+    """True positives, false positives and false negatives"""
+    assert len(y_true) == len(y_pred)
+    tp = fp = fn = 0
+    for y_true_i, y_pred_i in zip(y_true, y_pred):
+        actual = _value(y_true_i) >= threshold
+        predicted = _value(y_pred_i) >= threshold
+        tp += actual and predicted
+        fp += predicted and not actual
+        fn += actual and not predicted
+    return tp, fp, fn
+
+
+def precision(y_true: Values, y_pred: Values, threshold: float = 0.5) -> float:
+    """Fraction of predicted positives that are actual positives"""
+    tp, fp, _ = _confusion(y_true, y_pred, threshold)
+    return tp / max(tp + fp, 1)
+
+
+def recall(y_true: Values, y_pred: Values, threshold: float = 0.5) -> float:
+    """Fraction of actual positives that are predicted positives"""
+    tp, _, fn = _confusion(y_true, y_pred, threshold)
+    return tp / max(tp + fn, 1)
+
+
+def roc_auc(y_true: Values, y_pred: Values) -> float:
+    """
+    Area under the ROC curve, computed from the ranks of the predicted scores (ties get their average rank).
+    Raises ValueError when the targets hold a single class, for which the area is undefined.
+    """
+    assert len(y_true) == len(y_pred)
+    scores = sorted((_value(y_pred_i), _value(y_true_i) >= 0.5) for y_true_i, y_pred_i in zip(y_true, y_pred))
+    n_pos = sum([positive for _, positive in scores], 0)
+    n_neg = len(scores) - n_pos
+    if n_pos == 0 or n_neg == 0:
+        raise ValueError("roc_auc is undefined when only one class is present in y_true")
+
+    rank_sum = 0.0
+    start = 0
+    while start < len(scores):
+        end = start
+        while end < len(scores) and scores[end][0] == scores[start][0]:
+            end += 1
+        average_rank = (start + end + 1) / 2  # ranks are 1-based
+        rank_sum += average_rank * sum([positive for _, positive in scores[start:end]], 0)
+        start = end
+    return (rank_sum - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+
+
+class Metric(ABC):
+    """Streaming metric, accumulated batch by batch in constant memory"""
+
+    def __init__(self) -> None:
+        self.reset()
+
+    @abstractmethod
+    def reset(self) -> None:
+        """Clear the accumulated state"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update(self, y_true: Values, y_pred: Values) -> None:
+        """Accumulate a batch of targets and predictions"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def compute(self) -> float:
+        """Metric value over all the batches seen since the last reset"""
+        raise NotImplementedError
+
+
+class MeanMetric(Metric):
+    """Streaming mean of a per-batch metric function, weighted by batch size.
+
+    Exact for metrics which average over samples, such as ``binary_accuracy``.
+    """
+
+    def __init__(self, fn: Callable[[Values, Values], float]) -> None:
+        self.fn = fn
+        super(MeanMetric, self).__init__()
+
+    def reset(self) -> None:
+        self.total = 0.0
+        self.n_total = 0
+
+    def update(self, y_true: Values, y_pred: Values) -> None:
+        self.total += self.fn(y_true, y_pred) * len(y_true)
+        self.n_total += len(y_true)
+
+    def compute(self) -> float:
+        return self.total / max(self.n_total, 1)
+
+
+class BinaryAccuracy(Metric):
+    """Streaming binary accuracy"""
+
+    def reset(self) -> None:
+        self.n_exact = 0
+        self.n_total = 0
+
+    def update(self, y_true: Values, y_pred: Values) -> None:
+        self.n_exact += _n_exact(y_true, y_pred)
+        self.n_total += len(y_true)
+
+    def compute(self) -> float:
+        return self.n_exact / max(self.n_total, 1)
+
+
+class CategoricalAccuracy(Metric):
+    """Streaming categorical accuracy"""
+
+    def reset(self) -> None:
+        self.n_correct = 0
+        self.n_total = 0
+
+    def update(self, y_true: Values, y_pred: Sequence[Values]) -> None:
+        self.n_correct += _n_correct_classes(y_true, y_pred)
+        self.n_total += len(y_true)
+
+    def compute(self) -> float:
+        return self.n_correct / max(self.n_total, 1)
+
+
+class _ConfusionMetric(Metric):
+    """Streaming counts of true positives, false positives and false negatives"""
+
+    def __init__(self, threshold: float = 0.5) -> None:
+        self.threshold = threshold
+        super(_ConfusionMetric, self).__init__()
+
+    def reset(self) -> None:
+        self.tp = 0
+        self.fp = 0
+        self.fn = 0
+
+    def update(self, y_true: Values, y_pred: Values) -> None:
+        tp, fp, fn = _confusion(y_true, y_pred, self.threshold)
+        self.tp += tp
+        self.fp += fp
+        self.fn += fn
+
+
+class Precision(_ConfusionMetric):
+    """Streaming precision"""
+
+    def compute(self) -> float:
+        return self.tp / max(self.tp + self.fp, 1)
+
+
+class Recall(_ConfusionMetric):
+    """Streaming recall"""
+
+    def compute(self) -> float:
+        return self.tp / max(self.tp + self.fn, 1)
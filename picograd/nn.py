@@ -1,21 +1,139 @@
+import math
 import random
-from abc import ABC, abstractmethod
-from picograd.engine import Var
+from abc import ABC
+from picograd.engine import Var, FloatInt, no_grad, enable_grad, is_grad_enabled, topological_sort
 
-from typing import List, Optional, Union
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Set, Tuple, Union
 
 
 class Module(ABC):
+    """Base class for neural network modules.
+
+    Parameters are registered from the module attributes: any public attribute holding a ``Var``, a ``Module``
+    or a (nested) list of those. The flattened, ordered view of the parameters is built once and cached until
+    an attribute of any module is reassigned. In-place changes to a list attribute (e.g. ``layer.neurons.append``)
+    are not tracked, reassign the attribute instead. The version invalidating the cache is global rather than
+    per module tree: attributes are only assigned while building or restructuring models, never in the training
+    loop, so checking the cache stays a single comparison instead of a walk over the submodules.
+
+    Subclasses keeping their parameters elsewhere (e.g. in a dict) can override ``parameters``. The override is
+    then used by ``zero_grad`` and by the modules holding it, and ``named_parameters`` names the parameters
+    after their position.
+
+    Concurrency: ``predict`` and ``predict_batch`` only read parameter values, so any number of threads can
+    run them on one model at the same time, as long as no thread updates the parameters meanwhile. Calling the
+    module builds a computational graph holding on to the parameters, and ``backward`` accumulates into their
+    shared ``grad``: training must stay on a single thread. ``no_grad`` is thread-local.
+    """
+
+    # Bumped whenever an attribute of a module is assigned, invalidating the cached parameter views
+    _registry_version = 0
+
     def __init(self) -> None:
         pass
 
-    @abstractmethod
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        Module._registry_version += 1
+
+    def named_parameters(self) -> List[Tuple[str, Var]]:
+        """Flat, ordered list of (name, parameter) pairs, e.g. ('layers.0.neurons.1.w.2', Var(...))"""
+        if self._overrides_parameters():
+            return [(str(ind), p) for ind, p in enumerate(self.parameters())]
+        return self._registry()[0]
+
     def parameters(self) -> List[Var]:
-        raise NotImplementedError
+        """Flat, ordered list of parameters. The returned list is cached and shared, do not modify it."""
+        return self._registry()[1]
+
+    def num_parameters(self) -> int:
+        return len(self.parameters())
 
     def zero_grad(self) -> None:
-        for p in self.parameters():
+        if self._overrides_parameters():
+            for p in self.parameters():
+                p.grad = 0.0
+            return
+
+        _, _, flat_parameters, resetting_modules = self._registry()
+        for p in flat_parameters:
             p.grad = 0.0
+        # e.g. Embedding only resets its touched rows
+        for module in resetting_modules:
+            module.zero_grad()
+
+    def predict(self, x: Sequence[FloatInt]) -> List[float]:
+        """Grad-free forward pass of a single sample given as plain numbers"""
+        return self.predict_batch([x])[0]
+
+    def predict_batch(self, xs: Sequence[Sequence[FloatInt]]) -> List[List[float]]:
+        """Grad-free forward pass of a batch of samples given as plain numbers"""
+        with no_grad():
+            return [[out.data for out in self(x)] for x in xs]
+
+    def _overrides_parameters(self) -> bool:
+        return type(self).parameters is not Module.parameters
+
+    def _overrides_zero_grad(self) -> bool:
+        return type(self).zero_grad is not Module.zero_grad
+
+    def _registry(self) -> Tuple[List[Tuple[str, Var]], List[Var], List[Var], List["Module"]]:
+        """
+        Named parameters, parameters, parameters that zero_grad resets in a single flat pass and the modules
+        of the tree resetting their own gradients
+        """
+        cache = self.__dict__.get("_parameters_cache")
+        if cache is None or cache[0] != Module._registry_version:
+            named, flat, resetting = [], [], []
+            for name, value in vars(self).items():
+                if name.startswith("_"):
+                    continue
+                for item_name, item in _items_of(name, value):
+                    if isinstance(item, Var):
+                        named.append((item_name, item))
+                        flat.append(item)
+                        continue
+
+                    named.extend((f"{item_name}.{child_name}", p) for child_name, p in item.named_parameters())
+                    if item._overrides_zero_grad():
+                        resetting.append(item)
+                    elif item._overrides_parameters():
+                        flat.extend(item.parameters())
+                    else:
+                        _, _, item_flat, item_resetting = item._registry()
+                        flat.extend(item_flat)
+                        resetting.extend(item_resetting)
+            cache = (Module._registry_version, named, [p for _, p in named], flat, resetting)
+            # Bypass __setattr__, caching must not invalidate the registry
+            object.__setattr__(self, "_parameters_cache", cache)
+        return cache[1], cache[2], cache[3], cache[4]
+
+
+def _items_of(name: str, value: Any) -> Iterator[Tuple[str, Union[Var, Module]]]:
+    """Yields the parameters and submodules held by a module attribute"""
+    if isinstance(value, (Var, Module)):
+        yield name, value
+    elif isinstance(value, (list, tuple)):
+        for ind, item in enumerate(value):
+            yield from _items_of(f"{name}.{ind}", item)
+
+
+def _sigmoid(x: float) -> float:
+    # Numerically stable for large negative inputs
+    if x >= 0:
+        return 1 / (1 + math.exp(-x))
+    e = math.exp(x)
+    return e / (1 + e)
+
+
+# Activations applied on plain numbers, for the grad-free forward pass
+_ACTIVATIONS = {
+    None: lambda x: x,
+    'linear': lambda x: x,
+    'relu': lambda x: 0 if x < 0 else x,
+    'tanh': math.tanh,
+    'sigmoid': _sigmoid,
+}
 
 
 class Neuron(Module):
@@ -40,8 +158,18 @@ class Neuron(Module):
         raise NotImplementedError(
             f"Unexpected activation argument ('relu', 'tanh' and 'sigmoid' available). Got {self.activation}.")
 
-    def parameters(self) -> List[Var]:
-        return self.w + [self.b]
+    def predict_batch(self, xs: Sequence[Sequence[FloatInt]]) -> List[List[float]]:
+        return [[out] for out in self._predict_batch(xs)]
+
+    def _predict_batch(self, xs: Sequence[Sequence[FloatInt]]) -> List[float]:
+        """Neuron outputs for a batch of samples, reading each parameter value once per batch"""
+        if self.activation not in _ACTIVATIONS:
+            raise NotImplementedError(
+                f"Unexpected activation argument ('relu', 'tanh' and 'sigmoid' available). Got {self.activation}.")
+        activation: Callable[[float], float] = _ACTIVATIONS[self.activation]
+        w = [w_i.data for w_i in self.w]
+        b = self.b.data
+        return [activation(sum([w_i * x_i for w_i, x_i in zip(w, x)], b)) for x in xs]
 
     def __repr__(self) -> str:
         return f"Neuron({len(self.w)}, {self.activation if self.activation is not None else 'linear'})"
@@ -57,8 +185,9 @@ class Layer(Module):
         outs = [n(x) for n in self.neurons]
         return outs  # outs[0] if len(outs) == 1 else outs
 
-    def parameters(self) -> List[Var]:
-        return [p for n in self.neurons for p in n.parameters()]
+    def predict_batch(self, xs: Sequence[Sequence[FloatInt]]) -> List[List[float]]:
+        outs = [n._predict_batch(xs) for n in self.neurons]
+        return [list(sample_outs) for sample_outs in zip(*outs)]
 
     def __repr__(self) -> str:
         return f"Layer of [{', '.join(str(n) for n in self.neurons)}]"
@@ -79,8 +208,104 @@ class MLP(Module):
             x = layer(x)
         return x
 
-    def parameters(self) -> List[Var]:
-        return [p for layer in self.layers for p in layer.parameters()]
+    def predict_batch(self, xs: Sequence[Sequence[FloatInt]]) -> List[List[float]]:
+        for layer in self.layers:
+            xs = layer.predict_batch(xs)
+        return xs
 
     def __repr__(self) -> str:
         return f"MLP of [{', '.join(str(layer) for layer in self.layers)}]"
+
+
+class Embedding(Module):
+    """A lookup table of embedding vectors with sparse gradients.
+
+    Only the rows looked up since the last ``zero_grad`` take part in the computational graph,
+    so only those rows receive a gradient. ``touched_parameters`` exposes them to the
+    optimizers' ``sparse_step`` so that the cost of an update scales with the number of rows
+    used by a batch instead of with the size of the table. Lookups under ``no_grad`` are not tracked.
+    """
+
+    def __init__(self, num_embeddings: int, embedding_dim: int):
+        self.num_embeddings = num_embeddings
+        self.embedding_dim = embedding_dim
+        self.weight = [[Var(random.uniform(-1, 1)) for _ in range(embedding_dim)] for _ in range(num_embeddings)]
+        self._touched: Set[int] = set()
+
+    def __call__(self, indices: List[int]) -> List[List[Var]]:
+        rows = []
+        for index in indices:
+            index = self._index(index)
+            # Lookups without graph (e.g. inference) give no gradient, they must not queue rows for sparse_step
+            if is_grad_enabled():
+                self._touched.add(index)
+            rows.append(self.weight[index])
+        return rows
+
+    def predict_batch(self, xs: Sequence[Sequence[int]]) -> List[List[List[float]]]:
+        """Grad-free lookup of a batch of index lists, returning the values of the embedding rows"""
+        return [[[v.data for v in self.weight[self._index(index)]] for index in indices] for indices in xs]
+
+    def _index(self, index: Union[Var, FloatInt]) -> int:
+        index = int(index.data) if isinstance(index, Var) else int(index)
+        assert 0 <= index < self.num_embeddings, f"index {index} out of range for {self.num_embeddings} embeddings"
+        return index
+
+    def touched_parameters(self) -> List[Var]:
+        """Parameters of the rows looked up since the last call to zero_grad"""
+        return [p for index in sorted(self._touched) for p in self.weight[index]]
+
+    def zero_grad(self) -> None:
+        # Untouched rows never received a gradient, only the touched ones need a reset
+        for p in self.touched_parameters():
+            p.grad = 0.0
+        self._touched.clear()
+
+    def __repr__(self) -> str:
+        return f"Embedding({self.num_embeddings}, {self.embedding_dim})"
+
+
+class Checkpoint(Module):
+    """Gradient checkpointing of a model segment, e.g. a Layer.
+
+    The forward pass of the wrapped module runs without recording its graph, only its outputs are kept.
+    During backward the segment is recomputed from its inputs and the output gradients are propagated
+    through the recomputed graph, trading one extra forward pass of the segment for its intermediates' memory.
+    """
+
+    def __init__(self, module: Module):
+        self.module = module
+
+    def __call__(self, x: List[Var]) -> List[Var]:
+        if not is_grad_enabled():
+            return self.module(x)
+
+        inputs = list(x)
+        with no_grad():
+            values = [out.data for out in self.module(inputs)]
+        # Single node linking the outputs to the inputs, backpropagated once all output gradients are known
+        segment = Var(0.0, children=tuple(v for v in inputs if isinstance(v, Var)), op='segment')
+        outputs = [Var(value, children=(segment,), op='checkpoint') for value in values]
+
+        def _backward() -> None:
+            detached = [Var(v.data) if isinstance(v, Var) else v for v in inputs]
+            # backward may be called under no_grad, the recomputed segment still needs its graph
+            with enable_grad():
+                recomputed = self.module(detached)
+            for r, out in zip(recomputed, outputs):
+                r.grad += out.grad
+            for node in reversed(topological_sort(recomputed)):
+                node._backward()
+            for v, d in zip(inputs, detached):
+                if isinstance(v, Var):
+                    v.grad += d.grad
+
+        segment._backward = _backward
+
+        return outputs
+
+    def predict_batch(self, xs: Sequence[Sequence[FloatInt]]) -> List[List[float]]:
+        return self.module.predict_batch(xs)
+
+    def __repr__(self) -> str:
+        return f"Checkpoint({self.module})"
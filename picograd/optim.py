@@ -1,6 +1,7 @@
+import math
 from abc import ABC, abstractmethod
 from picograd.engine import Var
-from typing import List
+from typing import Dict, Iterable, List, Optional
 
 
 class Optimizer(ABC):
@@ -8,16 +9,32 @@ class Optimizer(ABC):
 
     def __init__(self, parameters: List[Var]) -> None:
         self.parameters: List[Var] = parameters
+        # Position of each parameter, used to find its optimizer state on sparse updates
+        self._index: Dict[Var, int] = {p: ind for ind, p in enumerate(parameters)}
 
     def zero_grad(self) -> None:
-        """Reset gradients for all parameters"""
+        """Reset gradients for all parameters.
+
+        This is a dense pass, which does not clear the rows touched by an Embedding: reset models holding
+        embeddings with their own ``zero_grad`` instead.
+        """
 
         for p in self.parameters:
             p.grad = 0.0
 
-    @abstractmethod
     def step(self) -> None:
         """Take a step of gradient descent"""
+
+        self._update(range(len(self.parameters)))
+
+    def sparse_step(self, parameters: List[Var]) -> None:
+        """Take a step of gradient descent only for the given subset of parameters (e.g. touched embedding rows)"""
+
+        self._update(self._index[p] for p in parameters)
+
+    @abstractmethod
+    def _update(self, indices: Iterable[int]) -> None:
+        """Update the parameters found at the given positions"""
         raise NotImplementedError
 
 
@@ -33,10 +50,11 @@ class SGD(Optimizer):
 
         self._velocity = [0] * len(parameters)
 
-    def step(self) -> None:
+    def _update(self, indices: Iterable[int]) -> None:
         """Update model parameters in the opposite direction of their gradient"""
 
-        for ind, p in enumerate(self.parameters):
+        for ind in indices:
+            p = self.parameters[ind]
             self._velocity[ind] = (self._velocity[ind] * self.momentum) - self.lr * p.grad
             if self.nesterov:
                 p.data += self._velocity[ind] * self.momentum - self.lr * p.grad
@@ -45,7 +63,11 @@ class SGD(Optimizer):
 
 
 class Adam(Optimizer):
-    """Adam optimizer"""
+    """Adam optimizer
+
+    On ``sparse_step`` it behaves as lazy Adam: the moment estimates are only updated for the given
+    parameters, while the step count used for bias correction is shared by all parameters.
+    """
 
     def __init__(self, parameters: List[Var], lr: float = 1e-3, beta_1: float = 0.9, beta_2: float = 0.999,
                  eps: float = 1e-8) -> None:
@@ -62,10 +84,11 @@ class Adam(Optimizer):
         self._exp_avg = [0] * len(parameters)
         self._exp_avg_sq = [0] * len(parameters)
 
-    def step(self) -> None:
+    def _update(self, indices: Iterable[int]) -> None:
         self._t += 1
 
-        for ind, p in enumerate(self.parameters):
+        for ind in indices:
+            p = self.parameters[ind]
             self._exp_avg[ind] = self.beta_1 * self._exp_avg[ind] + (1. - self.beta_1) * p.grad
             self._exp_avg_sq[ind] = self.beta_2 * self._exp_avg_sq[ind] + (1. - self.beta_2) * (p.grad ** 2)
 
@@ -73,3 +96,99 @@ class Adam(Optimizer):
             bias_correction_2 = self._exp_avg_sq[ind] / (1. - (self.beta_2 ** self._t))
 
             p.data -= self.lr * bias_correction_1 / (bias_correction_2 ** 0.5 + self.eps)
+
+
+class LRScheduler(ABC):
+    """Base class for learning rate schedules, stepped once per epoch"""
+
+    def __init__(self, optimizer: Optimizer) -> None:
+        assert hasattr(optimizer, "lr"), "optimizer has no learning rate to schedule"
+        self.optimizer = optimizer
+        self.base_lr: float = optimizer.lr
+        self.epoch = 0
+        self.optimizer.lr = self._compute_lr(None)
+
+    def step(self, metric: Optional[float] = None) -> None:
+        """Update the learning rate of the optimizer at the end of an epoch"""
+
+        self.epoch += 1
+        self.optimizer.lr = self._compute_lr(metric)
+
+    @abstractmethod
+    def _compute_lr(self, metric: Optional[float]) -> float:
+        """Learning rate for the current epoch"""
+        raise NotImplementedError
+
+
+class StepLR(LRScheduler):
+    """Decays the learning rate by gamma every step_size epochs"""
+
+    def __init__(self, optimizer: Optimizer, step_size: int, gamma: float = 0.1) -> None:
+        assert step_size > 0, "step_size must be positive"
+        self.step_size = step_size
+        self.gamma = gamma
+        super(StepLR, self).__init__(optimizer)
+
+    def _compute_lr(self, metric: Optional[float]) -> float:
+        return self.base_lr * self.gamma ** (self.epoch // self.step_size)
+
+
+class CosineAnnealingLR(LRScheduler):
+    """Anneals the learning rate from its initial value down to eta_min over t_max epochs following a cosine"""
+
+    def __init__(self, optimizer: Optimizer, t_max: int, eta_min: float = 0.0) -> None:
+        assert t_max > 0, "t_max must be positive"
+        self.t_max = t_max
+        self.eta_min = eta_min
+        super(CosineAnnealingLR, self).__init__(optimizer)
+
+    def _compute_lr(self, metric: Optional[float]) -> float:
+        progress = min(self.epoch, self.t_max) / self.t_max
+        return self.eta_min + (self.base_lr - self.eta_min) * (1 + math.cos(math.pi * progress)) / 2
+
+
+class LinearWarmup(LRScheduler):
+    """Increases the learning rate linearly up to its initial value over the first warmup_epochs epochs"""
+
+    def __init__(self, optimizer: Optimizer, warmup_epochs: int) -> None:
+        assert warmup_epochs > 0, "warmup_epochs must be positive"
+        self.warmup_epochs = warmup_epochs
+        super(LinearWarmup, self).__init__(optimizer)
+
+    def _compute_lr(self, metric: Optional[float]) -> float:
+        return self.base_lr * min(1.0, (self.epoch + 1) / self.warmup_epochs)
+
+
+class ReduceLROnPlateau(LRScheduler):
+    """Reduces the learning rate by factor once a monitored metric has stopped improving for patience epochs"""
+
+    def __init__(self, optimizer: Optimizer, mode: str = "min", factor: float = 0.1, patience: int = 10,
+                 min_delta: float = 0.0, min_lr: float = 0.0) -> None:
+        assert mode in ["min", "max"], f"Unexpected mode argument ('min', 'max' available). Got {mode}."
+        assert 0.0 < factor < 1.0, "factor must be in (0,1)"
+        self.mode = mode
+        self.factor = factor
+        self.patience = patience
+        self.min_delta = min_delta
+        self.min_lr = min_lr
+
+        self._best: Optional[float] = None
+        self._num_bad_epochs = 0
+        super(ReduceLROnPlateau, self).__init__(optimizer)
+
+    def _compute_lr(self, metric: Optional[float]) -> float:
+        lr = self.optimizer.lr
+        if metric is None:
+            return lr
+
+        sign = 1 if self.mode == "min" else -1
+        if self._best is None or sign * (self._best - metric) > self.min_delta:
+            self._best = metric
+            self._num_bad_epochs = 0
+        else:
+            self._num_bad_epochs += 1
+
+        if self._num_bad_epochs > self.patience:
+            self._num_bad_epochs = 0
+            return max(lr * self.factor, self.min_lr)
+        return lr
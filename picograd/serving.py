@@ -0,0 +1,309 @@
+"""
+Inference front-ends coalescing concurrent single-sample requests into batched grad-free forward passes.
+"""
+
+import asyncio
+import math
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from picograd.engine import FloatInt
+from picograd.nn import Module
+
+Sample = Sequence[FloatInt]
+
+# Sentinel telling the worker to exit
+_STOP = object()
+
+
+class ServingStats:
+    """Throughput and latency statistics of a predictor, latencies are kept for the last window requests"""
+
+    def __init__(self, window: int = 10000) -> None:
+        self.num_requests = 0
+        self.num_batches = 0
+        self._latencies: deque = deque(maxlen=window)
+        self._first_submitted: Optional[float] = None
+        self._last_served: Optional[float] = None
+
+    def record_batch(self, submitted: Sequence[float], served: float) -> None:
+        """Records a batch from the submission times of its requests and the time it was served"""
+
+        self.num_requests += len(submitted)
+        self.num_batches += 1
+        self._latencies.extend(served - t for t in submitted)
+        first = min(submitted)
+        if self._first_submitted is None or first < self._first_submitted:
+            self._first_submitted = first
+        self._last_served = served
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.num_requests / max(self.num_batches, 1)
+
+    @property
+    def throughput(self) -> float:
+        """Requests served per second"""
+        if self._first_submitted is None or self._last_served == self._first_submitted:
+            return 0.0
+        return self.num_requests / (self._last_served - self._first_submitted)
+
+    def latency_percentile(self, q: float) -> float:
+        """Latency in seconds below which q percent of the recent requests were served"""
+        if not self._latencies:
+            return 0.0
+        latencies = sorted(self._latencies)
+        rank = min(max(math.ceil(q / 100 * len(latencies)), 1), len(latencies))  # nearest-rank method
+        return latencies[rank - 1]
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "requests": self.num_requests,
+            "batches": self.num_batches,
+            "mean_batch_size": self.mean_batch_size,
+            "throughput": self.throughput,
+            "latency_p50": self.latency_percentile(50),
+            "latency_p95": self.latency_percentile(95),
+            "latency_p99": self.latency_percentile(99),
+        }
+
+
+def _predict(model: Module, samples: List[Sample]) -> List[Union[List[float], Exception]]:
+    """
+    Outputs of the samples, computed in one batch. If the batch fails, the samples are predicted one by one,
+    so that a malformed request only fails itself and not the requests batched with it.
+    """
+
+    try:
+        return model.predict_batch(samples)
+    except Exception:
+        results: List[Union[List[float], Exception]] = []
+        for x in samples:
+            try:
+                results.append(model.predict_batch([x])[0])
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+class BatchPredictor:
+    """
+        Thread-safe predictor coalescing concurrent requests into batches.
+
+        Requests can be submitted from any number of threads. A single worker thread takes the pending
+        requests, up to max_batch_size of them and waiting at most max_wait seconds for a batch to fill,
+        runs one ``model.predict_batch`` and resolves the futures of the requests. A request the model fails on
+        gets the exception, the other requests of its batch are still served.
+    """
+
+    def __init__(self, model: Module, max_batch_size: int = 32, max_wait: float = 0.001) -> None:
+        assert max_batch_size > 0, "max_batch_size must be positive"
+        assert max_wait >= 0, "max_wait cannot be negative"
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self.stats = ServingStats()
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="picograd-batch-predictor", daemon=True)
+        self._worker.start()
+
+    def submit(self, x: Sample) -> Future:
+        """Queue a single sample, the returned future resolves to the model outputs"""
+
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("cannot submit requests to a closed BatchPredictor")
+            self._queue.put((x, future, time.perf_counter()))
+        return future
+
+    def predict(self, x: Sample, timeout: Optional[float] = None) -> List[float]:
+        """Blocking prediction of a single sample"""
+
+        return self.submit(x).result(timeout=timeout)
+
+    def close(self) -> None:
+        """Serve the pending requests and stop the worker thread"""
+
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._worker.join()
+
+    def __enter__(self) -> "BatchPredictor":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._serve(batch)
+
+    def _serve(self, batch: List[Tuple[Sample, Future, float]]) -> None:
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        results = _predict(self.model, [x for x, _, _ in batch])
+        served = [submitted for (_, _, submitted), result in zip(batch, results) if not isinstance(result, Exception)]
+        if served:
+            self.stats.record_batch(served, time.perf_counter())
+        for (_, future, _), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+class AsyncBatchPredictor:
+    """
+        asyncio micro-batching predictor.
+
+        Awaiting ``predict`` queues the request. A worker task forms a batch from the pending requests, up to
+        max_batch_size of them and waiting at most max_latency seconds for a batch to fill, runs one
+        ``model.predict_batch`` and resolves the futures of the requests. The batch is computed in the default
+        executor of the loop, so the event loop keeps serving other I/O meanwhile. A request the model fails on
+        gets the exception, the other requests of its batch are still served.
+        Must be started with ``start`` (or used as an async context manager) from a running event loop.
+    """
+
+    def __init__(self, model: Module, max_batch_size: int = 32, max_latency: float = 0.002) -> None:
+        assert max_batch_size > 0, "max_batch_size must be positive"
+        assert max_latency >= 0, "max_latency cannot be negative"
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.stats = ServingStats()
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # Set before the worker is told to stop, so that no request gets queued behind _STOP
+        self._closing = False
+
+    async def start(self) -> None:
+        assert self._worker is None, "AsyncBatchPredictor already started"
+        self._queue = asyncio.Queue()
+        self._closing = False
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Serve the pending requests and stop the worker task"""
+
+        if self._worker is None or self._closing:
+            return
+        self._closing = True
+        await self._queue.put(_STOP)
+        await self._worker
+        self._worker = None
+
+    async def predict(self, x: Sample) -> List[float]:
+        if self._worker is None or self._closing:
+            raise RuntimeError("AsyncBatchPredictor is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((x, future, time.perf_counter()))
+        return await future
+
+    async def __aenter__(self) -> "AsyncBatchPredictor":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stop = False
+        while not stop:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.max_latency
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            await self._serve(batch)
+
+    async def _serve(self, batch: List[Tuple[Sample, asyncio.Future, float]]) -> None:
+        batch = [item for item in batch if not item[1].cancelled()]
+        if not batch:
+            return
+
+        # predict_batch only reads the parameters, it can run on another thread
+        results = await asyncio.get_running_loop().run_in_executor(None, _predict, self.model,
+                                                                   [x for x, _, _ in batch])
+        served = [submitted for (_, _, submitted), result in zip(batch, results) if not isinstance(result, Exception)]
+        if served:
+            self.stats.record_batch(served, time.perf_counter())
+        for (_, future, _), result in zip(batch, results):
+            # The client may have given up on its request while the batch was computed
+            if future.cancelled():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+async def run_synthetic_load(predictor: AsyncBatchPredictor, samples: Sequence[Sample],
+                             concurrency: int = 32) -> Dict[str, Any]:
+    """
+    Synthetic load generator: concurrency clients send the samples to a running predictor, each client
+    waiting for its previous answer before sending its next request
+    :param predictor: started AsyncBatchPredictor
+    :param samples: requests to send, each sent once
+    :param concurrency: number of concurrent clients
+    :return: predictions in the order of the samples and the predictor stats summary
+    """
+
+    predictions: List[Optional[List[float]]] = [None] * len(samples)
+    pending = iter(range(len(samples)))
+
+    async def client() -> None:
+        for ind in pending:
+            predictions[ind] = await predictor.predict(samples[ind])
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return {"predictions": predictions, "stats": predictor.stats.summary()}
@@ -1,68 +1,189 @@
+from picograd.engine import Var, no_grad
 from picograd.nn import Module
-from picograd.optim import Optimizer
-from picograd.data import BatchIterator
+from picograd.optim import Optimizer, LRScheduler
+from picograd.metrics import Metric, MeanMetric, Precision, Recall, precision, recall, roc_auc
+from picograd.data import Batch, BatchIterator
 
-from typing import Callable, Dict, List
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 # Used to record training history for metrics
 History = Dict[str, List[float]]
 
+# Metric functions which are not averages over samples, so that a batch-weighted mean of them is wrong
+_STREAMING_METRICS: Dict[Callable, Callable[[], Metric]] = {precision: Precision, recall: Recall}
+_NON_STREAMING_METRICS = {roc_auc}
+
+
+class EarlyStopping:
+    """Stops training once a monitored metric has stopped improving and keeps track of the best parameters"""
+
+    def __init__(self, monitor: str = "val_loss", mode: str = "min", patience: int = 5, min_delta: float = 0.0,
+                 restore_best: bool = True) -> None:
+        assert mode in ["min", "max"], f"Unexpected mode argument ('min', 'max' available). Got {mode}."
+        self.monitor = monitor
+        self.mode = mode
+        self.patience = patience
+        self.min_delta = min_delta
+        self.restore_best = restore_best
+        self.reset()
+
+    def reset(self) -> None:
+        self.best: Optional[float] = None
+        self.best_epoch = -1
+        self._best_parameters: List[float] = []
+        self._num_bad_epochs = 0
+
+    def update(self, history: History, model: Module) -> bool:
+        """Records the last epoch of the history, returns True when training should stop"""
+
+        value = history[self.monitor][-1]
+        sign = 1 if self.mode == "min" else -1
+        if self.best is None or sign * (self.best - value) > self.min_delta:
+            self.best = value
+            self.best_epoch = len(history[self.monitor]) - 1
+            self._best_parameters = [p.data for p in model.parameters()]
+            self._num_bad_epochs = 0
+            return False
+
+        # Like Keras, stop after patience epochs in a row without improvement
+        self._num_bad_epochs += 1
+        return self._num_bad_epochs >= self.patience
+
+    def restore(self, model: Module) -> None:
+        """Loads the best parameters seen so far back into the model"""
+
+        for p, data in zip(model.parameters(), self._best_parameters):
+            p.data = data
+
 
 class Trainer:
     """Encapsulates the model training loop"""
 
-    def __init__(self, model: Module, optimizer: Optimizer, loss: Callable, acc_metric: Callable) -> None:
+    def __init__(self, model: Module, optimizer: Optimizer, loss: Callable,
+                 acc_metric: Union[Callable, Metric]) -> None:
         self.model = model
         self.optimizer = optimizer
         self.loss = loss
-        self.acc_metric = acc_metric
+        self.acc_metric = self._streaming(acc_metric)
 
-    def fit(self, data_iterator: BatchIterator, num_epochs: int = 500, verbose: bool = False) -> History:
-        """Fits the model to the data"""
+    @staticmethod
+    def _streaming(acc_metric: Union[Callable, Metric]) -> Metric:
+        """Metric accumulated batch by batch, so that predictions need not be kept for the whole epoch"""
+
+        if isinstance(acc_metric, Metric):
+            return acc_metric
+        if acc_metric in _STREAMING_METRICS:
+            return _STREAMING_METRICS[acc_metric]()
+        assert acc_metric not in _NON_STREAMING_METRICS, \
+            f"{acc_metric.__name__} cannot be accumulated batch by batch, pass a Metric instance instead"
+        # Exact for metric functions averaging over samples, e.g. binary_accuracy
+        return MeanMetric(acc_metric)
+
+    def fit(self, data_iterator: BatchIterator, num_epochs: int = 500, verbose: bool = False,
+            validation_data: Optional[BatchIterator] = None, early_stopping: Optional[EarlyStopping] = None,
+            lr_scheduler: Optional[LRScheduler] = None) -> History:
+        """
+        Fits the model to the data
+        :param data_iterator: training data
+        :param num_epochs: maximum number of epochs
+        :param verbose: print metrics at every epoch
+        :param validation_data: data evaluated at the end of every epoch, recorded as 'val_loss' and 'val_acc'
+        :param early_stopping: stops training once its monitored metric stops improving
+        :param lr_scheduler: stepped at the end of every epoch with the validation loss if available, else the loss
+        :return: History
+        """
 
         history: History = {"loss": [], "acc": []}
-        epoch_loss = 0
-        epoch_acc = 0
-        epoch_y_true = []
-        epoch_y_pred = []
+        if validation_data is not None:
+            history.update({"val_loss": [], "val_acc": []})
+        if lr_scheduler is not None:
+            history["lr"] = []
+        if early_stopping is not None:
+            assert early_stopping.monitor in history, f"Cannot monitor {early_stopping.monitor}, not recorded in history"
+            early_stopping.reset()
+
         for epoch in range(num_epochs):
-            # Reset the gradients of model parameters
-            self.optimizer.zero_grad()
+            # Reset the gradients of model parameters, through the model so that embeddings only reset their touched rows
+            self.model.zero_grad()
             # Reset epoch data
-            epoch_loss = 0
-            epoch_y_true = []
-            epoch_y_pred = []
+            epoch_loss = 0.0
+            self.acc_metric.reset()
 
             for batch in data_iterator():
                 # Forward pass
-                # outputs = [self.model(mini_batch_input) for mini_batch_input in batch.inputs]
-                outputs = list(map(self.model, batch.inputs))
+                batch_y_pred = self._forward(batch)
 
                 # Loss computation
-                batch_y_pred = [item for sublist in outputs for item in sublist]
                 batch_loss = self.loss(batch.targets, batch_y_pred)
                 epoch_loss += batch_loss.data
 
-                # Store batch predictions and ground truth for computing epoch metrics
-                epoch_y_pred.extend(batch_y_pred)
-                epoch_y_true.extend(batch.targets)
+                # Accumulate epoch metrics, batch predictions are released once the batch is done
+                self.acc_metric.update(batch.targets, batch_y_pred)
 
                 # Backprop and gradient descent
                 batch_loss.backward()
                 self.optimizer.step()
 
             # Accuracy computation for epoch
-            epoch_acc = self.acc_metric(epoch_y_true, epoch_y_pred)
+            epoch_acc = self.acc_metric.compute()
 
-            # Record training history
-            history["loss"].append(epoch_loss)
-            history["acc"].append(epoch_acc)
+            # Record training history, validate and check for early stopping
+            if self._end_epoch(history, epoch, num_epochs, epoch_loss, epoch_acc, verbose,
+                               validation_data, early_stopping, lr_scheduler):
+                break
 
-            if verbose:
-                print(
-                    f"Epoch [{epoch + 1}/{num_epochs}], "
-                    f"loss: {epoch_loss:.6f}, "
-                    f"accuracy: {epoch_acc * 100:.2f}%"
-                )
+        if early_stopping is not None and early_stopping.restore_best:
+            early_stopping.restore(self.model)
 
         return history
+
+    def _end_epoch(self, history: History, epoch: int, num_epochs: int, epoch_loss: float, epoch_acc: float,
+                   verbose: bool, validation_data: Optional[BatchIterator], early_stopping: Optional[EarlyStopping],
+                   lr_scheduler: Optional[LRScheduler]) -> bool:
+        """Records the epoch in the history, runs validation and the schedules. Returns True to stop training."""
+
+        history["loss"].append(epoch_loss)
+        history["acc"].append(epoch_acc)
+
+        message = f"Epoch [{epoch + 1}/{num_epochs}], loss: {epoch_loss:.6f}, accuracy: {epoch_acc * 100:.2f}%"
+        if validation_data is not None:
+            val_loss, val_acc = self.evaluate(validation_data)
+            history["val_loss"].append(val_loss)
+            history["val_acc"].append(val_acc)
+            message += f", val_loss: {val_loss:.6f}, val_accuracy: {val_acc * 100:.2f}%"
+
+        if lr_scheduler is not None:
+            history["lr"].append(self.optimizer.lr)
+            lr_scheduler.step(history["val_loss" if validation_data is not None else "loss"][-1])
+
+        if verbose:
+            print(message)
+
+        if early_stopping is not None and early_stopping.update(history, self.model):
+            if verbose:
+                print(f"Early stopping, best {early_stopping.monitor} at epoch {early_stopping.best_epoch + 1}")
+            return True
+        return False
+
+    def evaluate(self, data_iterator: BatchIterator) -> Tuple[float, float]:
+        """Loss and accuracy of the model on the data, computed without building the computational graph"""
+
+        loss = 0.0
+        self.acc_metric.reset()
+        with no_grad():
+            for batch in data_iterator():
+                batch_y_pred = self._forward(batch)
+                loss += self.loss(batch.targets, batch_y_pred).data
+                self.acc_metric.update(batch.targets, batch_y_pred)
+        return loss, self.acc_metric.compute()
+
+    def _forward(self, batch: Batch) -> Union[List[Var], List[List[Var]]]:
+        """
+        Model predictions for a batch: one Var per sample for single-output models,
+        else one output vector per sample (e.g. class logits for softmax_cross_entropy)
+        """
+
+        outputs = list(map(self.model, batch.inputs))
+        if all(len(sample_outputs) == 1 for sample_outputs in outputs):
+            return [item for sublist in outputs for item in sublist]
+        return outputs
@@ -24,7 +24,6 @@ setup(
         "Development Status :: 3 - Alpha",
         "License :: OSI Approved :: MIT License",
         "Programming Language :: Python",
-        "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
         'Programming Language :: Python :: 3 :: Only',
@@ -34,7 +33,8 @@ setup(
     ],
     keywords='picograd, autograd, backprop, nn, graph',
     packages=find_packages(['picograd', 'picograd.*']),
-    python_requires='>=3.6, <4',
+    python_requires='>=3.7, <4',
     data_files=[('misc', ['misc/moon_mlp.png', 'misc/simple_graph.png'])],
     install_requires=['graphviz'],
+    extras_require={'numpy': ['numpy']},
 )
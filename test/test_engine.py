@@ -1,6 +1,7 @@
+import threading
 import unittest
 
-from picograd.engine import Var
+from picograd.engine import Var, no_grad, enable_grad, is_grad_enabled
 
 
 class TestEngine(unittest.TestCase):
@@ -108,8 +109,36 @@ class TestEngine(unittest.TestCase):
         # forward pass went well
         self.assertAlmostEqual(h.data, 0.989, 3)
         # backward pass went well
-        self.assertAlmostEqual(a.grad, -0.115, 3)
-        self.assertAlmostEqual(b.grad, -0.505, 3)
+        self.assertAlmostEqual(a.grad, -0.114, 3)
+        self.assertAlmostEqual(b.grad, -0.500, 3)
+
+    def test_no_grad(self):
+        x = Var(2.0)
+        with no_grad():
+            self.assertFalse(is_grad_enabled())
+            y = (x * 3 + 1).tanh()
+        self.assertTrue(is_grad_enabled())
+
+        # Values are computed but no graph is recorded
+        self.assertAlmostEqual(y.data, 0.9999, 3)
+        self.assertEqual(len(y.children), 0)
+        y.backward()
+        self.assertEqual(x.grad, 0.0)
+
+        # Grad mode is thread-local
+        enabled_in_thread = []
+        with no_grad():
+            thread = threading.Thread(target=lambda: enabled_in_thread.append(is_grad_enabled()))
+            thread.start()
+            thread.join()
+        self.assertEqual(enabled_in_thread, [True])
+
+        with no_grad():
+            with enable_grad():
+                self.assertTrue(is_grad_enabled())
+                y = x * 3
+            self.assertFalse(is_grad_enabled())
+        self.assertIn(x, y.children)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+from picograd.nn import MLP, Checkpoint
+from picograd.export import export_mlp, save_artifact, load_artifact, InferenceModel, np
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.model = MLP(in_features=3, layers=[5, 4, 2], activations=['relu', 'tanh', 'sigmoid'])
+        self.inputs = [[0.5, -1.0, 2.0], [1.5, 0.25, -0.75], [-3.0, 1.5, 0.0]]
+
+    def assertPredictionsEqual(self, predictions, expected):
+        self.assertEqual(len(predictions), len(expected))
+        for prediction, expected_outs in zip(predictions, expected):
+            self.assertEqual(len(prediction), len(expected_outs))
+            for out, expected_out in zip(prediction, expected_outs):
+                self.assertAlmostEqual(out, expected_out, 9)
+
+    def test_export(self):
+        artifact = export_mlp(self.model)
+        self.assertEqual(artifact["in_features"], 3)
+        self.assertEqual([layer["activation"] for layer in artifact["layers"]], ['relu', 'tanh', 'sigmoid'])
+        self.assertEqual(len(artifact["layers"][1]["weights"]), 4)
+        self.assertEqual(len(artifact["layers"][1]["weights"][0]), 5)
+
+        # Mixed activations within a layer cannot be exported
+        self.model.layers[0].neurons[0].activation = 'tanh'
+        with self.assertRaises(AssertionError):
+            export_mlp(self.model)
+
+    def test_inference_model(self):
+        expected = self.model.predict_batch(self.inputs)
+
+        evaluator = InferenceModel(export_mlp(self.model), use_numpy=False)
+        self.assertPredictionsEqual(evaluator.predict_batch(self.inputs), expected)
+        self.assertPredictionsEqual([evaluator.predict(self.inputs[0])], expected[:1])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "model.json")
+            save_artifact(export_mlp(self.model), path)
+            self.assertEqual(load_artifact(path), export_mlp(self.model))
+            evaluator = InferenceModel.from_file(path, use_numpy=False)
+            self.assertPredictionsEqual(evaluator.predict_batch(self.inputs), expected)
+
+        # Samples of the wrong width are rejected rather than truncated
+        with self.assertRaises(ValueError):
+            evaluator.predict([0.5, -1.0])
+        self.assertEqual(evaluator.predict_batch([]), [])
+
+    def test_export_checkpointed(self):
+        expected = export_mlp(self.model)
+        self.model.layers = [Checkpoint(layer) for layer in self.model.layers]
+        self.assertEqual(export_mlp(self.model), expected)
+
+        evaluator = InferenceModel(export_mlp(self.model), use_numpy=False)
+        self.assertPredictionsEqual(evaluator.predict_batch(self.inputs), self.model.predict_batch(self.inputs))
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_inference_model_numpy(self):
+        expected = self.model.predict_batch(self.inputs)
+        evaluator = InferenceModel(export_mlp(self.model), use_numpy=True)
+        self.assertPredictionsEqual(evaluator.predict_batch(self.inputs), expected)
+
+        # Samples of the wrong width are rejected rather than re-chunked into rows
+        with self.assertRaises(ValueError):
+            evaluator.predict([0.5, -1.0, 2.0, 1.5, 0.25, -0.75])
+        self.assertEqual(evaluator.predict_batch([]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import itertools
+import random
+import unittest
+
+from picograd.engine import Var
+from picograd.nn import MLP, Checkpoint, Embedding
+from picograd.metrics import mean_squared_error, binary_cross_entropy, hinge_loss, softmax_cross_entropy
+from picograd.graph_passes import optimize
+from picograd.gradcheck import gradcheck, gradcheck_module, directional_gradcheck
+
+ACTIVATIONS = ['linear', 'relu', 'tanh', 'sigmoid']
+
+
+class TestGradcheck(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+
+    def assertGradcheck(self, fn, inputs, **kwargs):
+        result = gradcheck(fn, inputs, **kwargs)
+        self.assertTrue(result.passed, [entry for entry in result.entries if not entry.passed])
+
+    def test_ops(self):
+        a, b = Var(-0.7), Var(1.3)
+        ops = {
+            'add': lambda: a + b + 2,
+            'sub': lambda: a - b - 2 + (3 - b),
+            'mul': lambda: a * b * 2,
+            'div': lambda: a / b + 2 / b + b / 3,
+            'neg': lambda: -a,
+            'pow': lambda: b ** 3 + b ** -1 + b ** 0.5,
+            'exp': lambda: a.exp(),
+            'tanh': lambda: a.tanh(),
+            'relu': lambda: a.relu() + b.relu(),
+            'sigmoid': lambda: a.sigmoid() + (a * b).sigmoid(),
+        }
+        for name, fn in ops.items():
+            with self.subTest(op=name):
+                self.assertGradcheck(fn, [a, b])
+
+    def test_losses(self):
+        y_pred = [Var(0.2), Var(0.7), Var(-0.4)]
+        self.assertGradcheck(lambda: mean_squared_error([0.0, 1.0, -1.0], y_pred), y_pred)
+        self.assertGradcheck(lambda: hinge_loss([1, -1, -1], y_pred), y_pred)
+        self.assertGradcheck(lambda: binary_cross_entropy([1, 0], y_pred[:2]), y_pred[:2])
+        self.assertGradcheck(lambda: softmax_cross_entropy([2, 0], [y_pred, y_pred[::-1]]), y_pred)
+
+    def test_mlp_activations(self):
+        x = [Var(0.3), Var(-0.8)]
+        for activations in itertools.product(ACTIVATIONS, repeat=2):
+            with self.subTest(activations=activations):
+                model = MLP(in_features=2, layers=[3, 2], activations=list(activations))
+                result = gradcheck_module(model, x)
+                self.assertEqual(len(result.entries), model.num_parameters() + len(x))
+                self.assertTrue(result.passed, [entry for entry in result.entries if not entry.passed])
+
+    def test_directional(self):
+        x = [Var(0.3), Var(-0.8)]
+        for activations in itertools.product(ACTIVATIONS, repeat=2):
+            with self.subTest(activations=activations):
+                model = MLP(in_features=2, layers=[3, 2], activations=list(activations))
+                result = gradcheck_module(model, x, num_directions=3)
+                self.assertEqual([entry.name for entry in result.entries], ['direction.0', 'direction.1', 'direction.2'])
+                self.assertTrue(result.passed, [entry for entry in result.entries if not entry.passed])
+
+        # The directions only depend on the seed
+        model = MLP(in_features=2, layers=[4, 1], activations=['tanh', 'sigmoid'])
+        self.assertEqual(gradcheck_module(model, x, num_directions=2, seed=3),
+                         gradcheck_module(model, x, num_directions=2, seed=3))
+
+    def test_graph_passes_and_checkpoint(self):
+        a, b = Var(-0.7), Var(1.3)
+        self.assertGradcheck(lambda: optimize(((a - b) ** 2 + (a - b) ** 2) / 2 + (a * b).tanh() - 3 / b), [a, b])
+
+        model = MLP(in_features=2, layers=[3, 3, 1], activations=['tanh', 'sigmoid', 'linear'])
+        model.layers = [Checkpoint(layer) for layer in model.layers]
+        self.assertTrue(gradcheck_module(model, [Var(0.3), Var(-0.8)]).passed)
+
+        embedding = Embedding(num_embeddings=5, embedding_dim=2)
+        self.assertGradcheck(lambda: sum([v * v for row in embedding([1, 3, 1]) for v in row], 0.0),
+                             embedding.parameters())
+
+    def test_report(self):
+        x = Var(0.5, label='x')
+
+        def wrong_backward():
+            out = Var(x.data ** 2, children=(x,), op='square')
+
+            def _backward():
+                x.grad += x.data * out.grad  # missing factor 2
+
+            out._backward = _backward
+            return out
+
+        result = gradcheck(wrong_backward, [x])
+        self.assertFalse(result.passed)
+        entry = result.entries[0]
+        self.assertEqual(entry.name, 'x')
+        self.assertAlmostEqual(entry.analytic, 0.5, 9)
+        self.assertAlmostEqual(entry.numeric, 1.0, 6)
+        self.assertAlmostEqual(entry.rel_error, 0.5, 6)
+        self.assertEqual(x.data, 0.5)  # inputs are restored
+
+        y = Var(-1.5)
+        result = directional_gradcheck(lambda: wrong_backward() + y.tanh(), [x, y], num_directions=2)
+        self.assertFalse(any(entry.passed for entry in result.entries))
+        self.assertEqual((x.data, y.data), (0.5, -1.5))
+
+        # Inputs are restored when a perturbed forward pass raises
+        z = Var(1.0)
+
+        def fails_when_perturbed():
+            if z.data != 1.0:
+                raise ValueError("math domain error")
+            return z * 2
+
+        with self.assertRaises(ValueError):
+            gradcheck(fails_when_perturbed, [z])
+        self.assertEqual(z.data, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
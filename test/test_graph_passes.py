@@ -0,0 +1,103 @@
+import unittest
+
+from picograd.engine import Var
+from picograd.graph_passes import optimize, count_nodes
+
+
+class TestGraphPasses(unittest.TestCase):
+    def assertSameGradients(self, build, values):
+        xs = [Var(v) for v in values]
+        expected_out = build(*xs)
+        expected_out.backward()
+        expected_grads = [x.grad for x in xs]
+
+        xs = [Var(v) for v in values]
+        out = build(*xs)
+        optimized = optimize(out)
+        self.assertAlmostEqual(optimized.data, expected_out.data, 9)
+        optimized.backward()
+        for x, expected_grad in zip(xs, expected_grads):
+            self.assertAlmostEqual(x.grad, expected_grad, 9)
+        return out, optimized
+
+    def test_fusion(self):
+        out, optimized = self.assertSameGradients(lambda x, y: x - y, [2.5, 3.5])
+        self.assertEqual(optimized.op, '-')
+        self.assertEqual(count_nodes(out), 5)  # x + (y * -1)
+        self.assertEqual(count_nodes(optimized), 3)
+
+        _, optimized = self.assertSameGradients(lambda x, y: x / y, [1.0, 4.0])
+        self.assertEqual(optimized.op, '/')
+
+        _, optimized = self.assertSameGradients(lambda x: 3 / x, [2.0])
+        self.assertEqual(optimized.op, '/')
+
+        _, optimized = self.assertSameGradients(lambda x: -x, [2.0])
+        self.assertEqual(optimized.op, 'neg')
+
+        _, optimized = self.assertSameGradients(lambda x: 3 - x, [2.0])
+        self.assertEqual(optimized.op, '-')
+
+        _, optimized = self.assertSameGradients(lambda x: x - x, [2.0])
+        self.assertEqual(optimized.op, '-')
+
+    def test_reoptimize(self):
+        # The operands of the subtractions and divisions built by a pass keep their order when rebuilt again
+        for _ in range(20):
+            out, optimized = self.assertSameGradients(lambda x, y: x - y * 2 + 1 / (x * y) ** 1.0, [0.7, -1.9])
+            self.assertIs(optimize(optimized), optimized)
+
+        x, y = Var(0.7), Var(-1.9)
+        combined = optimize(optimize(x - y * 2) + optimize(x / y - y))
+        self.assertAlmostEqual(combined.data, 0.7 + 3.8 + 0.7 / -1.9 + 1.9, 9)
+        combined.backward()
+        self.assertAlmostEqual(x.grad, 1 + 1 / -1.9, 9)
+        self.assertAlmostEqual(y.grad, -2 - 0.7 / 1.9 ** 2 - 1, 9)
+
+        # Float powers of -1 are fused as well
+        self.assertEqual(optimize(3 * x ** -1.0).op, '/')
+
+    def test_constant_folding(self):
+        out, optimized = self.assertSameGradients(lambda x: x * (Var.constant(2) * 3 + 1) ** 2, [1.5])
+        self.assertEqual(count_nodes(optimized), 3)  # x * 49
+        self.assertEqual(sorted(c.data for c in optimized.children), [1.5, 49])
+
+        # Multiplications by one and additions of zero are dropped
+        x = Var(2.0)
+        self.assertIs(optimize(x * 1 + 0), x)
+
+    def test_common_subexpression_elimination(self):
+        def loss(x, y):
+            return ((x - y) ** 2 + (x - y) ** 2) / 2 + (x * y).tanh() + (y * x).tanh()
+
+        out, optimized = self.assertSameGradients(loss, [0.3, -0.7])
+        self.assertEqual(count_nodes(out), 19)
+        self.assertEqual(count_nodes(optimize(out, fold_constants=False, fuse=False)), 13)
+        self.assertEqual(count_nodes(optimized), 11)
+
+    def test_opaque_ops(self):
+        from picograd.metrics import mean_squared_error
+
+        out, optimized = self.assertSameGradients(
+            lambda x, y: mean_squared_error([Var(1.0), Var(2.0)], [x - y, x / y]) * 1, [0.5, 2.0])
+        self.assertEqual(optimized.op, 'mse')
+
+    def test_mixed_ops(self):
+        def expression(a, b):
+            c = a + b
+            d = a * b + b ** 3
+            c += c + 1
+            c += 1 + c + (-a)
+            d += d * 2 + (b + a).relu()
+            d += 3 * d + (b - a).tanh()
+            e = c - d
+            f = e ** 2
+            g = f / 2.0
+            g += 10.0 / f
+            return g.exp().sigmoid() + (a * a).exp()
+
+        self.assertSameGradients(expression, [-0.4, 0.2])
+
+
+if __name__ == "__main__":
+    unittest.main()
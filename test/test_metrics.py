@@ -1,7 +1,9 @@
+import math
 import unittest
 
 from picograd.engine import Var
-from picograd.metrics import mean_squared_error, binary_accuracy
+from picograd.metrics import mean_squared_error, binary_accuracy, binary_cross_entropy, hinge_loss, precision, recall, \
+    roc_auc, softmax_cross_entropy, categorical_accuracy, BinaryAccuracy, CategoricalAccuracy, Precision, Recall
 
 
 class TestMetrics(unittest.TestCase):
@@ -11,6 +13,94 @@ class TestMetrics(unittest.TestCase):
         error = mean_squared_error(y_true, y_pred)
         self.assertAlmostEqual(error.data, 0.375, 3)
 
+        # Single fused node, gradients flow to every prediction
+        self.assertEqual(error.op, 'mse')
+        error.backward()
+        self.assertEqual([p.grad for p in y_pred], [-0.25, 0.25, 0.0, 0.5])
+
+        # Plain numbers are accepted as targets
+        error = mean_squared_error([3, -0.5, 2, 7], y_pred)
+        self.assertAlmostEqual(error.data, 0.375, 3)
+
+    def test_binary_cross_entropy(self):
+        y_pred = [Var(0.9), Var(0.2)]
+        loss = binary_cross_entropy([1, 0], y_pred)
+        self.assertAlmostEqual(loss.data, -(math.log(0.9) + math.log(0.8)) / 2, 6)
+
+        loss.backward()
+        self.assertAlmostEqual(y_pred[0].grad, -1 / 0.9 / 2, 6)
+        self.assertAlmostEqual(y_pred[1].grad, 1 / 0.8 / 2, 6)
+
+    def test_hinge_loss(self):
+        y_pred = [Var(2.0), Var(0.5), Var(0.5)]
+        loss = hinge_loss([1, 1, -1], y_pred)
+        self.assertAlmostEqual(loss.data, (0 + 0.5 + 1.5) / 3, 6)
+
+        loss.backward()
+        self.assertEqual(y_pred[0].grad, 0)
+        self.assertAlmostEqual(y_pred[1].grad, -1 / 3, 6)
+        self.assertAlmostEqual(y_pred[2].grad, 1 / 3, 6)
+
+    def test_precision_recall_auc(self):
+        y_true = [1, 1, 0, 0, 1]
+        y_pred = [0.9, 0.4, 0.6, 0.1, 0.8]
+        self.assertAlmostEqual(precision(y_true, y_pred), 2 / 3, 6)
+        self.assertAlmostEqual(recall(y_true, y_pred), 2 / 3, 6)
+        self.assertAlmostEqual(roc_auc(y_true, y_pred), 5 / 6, 6)
+
+        # Ties count as half
+        self.assertEqual(roc_auc([0, 1], [0.5, 0.5]), 0.5)
+        self.assertEqual(roc_auc([0, 1], [0.2, 0.7]), 1.0)
+
+        # Undefined with a single class, rather than reported as the worst classifier
+        with self.assertRaises(ValueError):
+            roc_auc([1, 1], [0.2, 0.7])
+
+    def test_softmax_cross_entropy(self):
+        logits = [[Var(2.0), Var(1.0), Var(0.1)], [Var(0.5), Var(2.5), Var(-1.0)]]
+        loss = softmax_cross_entropy([0, 2], logits)
+
+        def expected_loss(sample_logits, k):
+            values = [v.data for v in sample_logits]
+            return -math.log(math.exp(values[k]) / sum(math.exp(v) for v in values))
+
+        self.assertAlmostEqual(loss.data, (expected_loss(logits[0], 0) + expected_loss(logits[1], 2)) / 2, 9)
+        self.assertEqual(loss.op, 'softmax_ce')
+
+        # Gradients are (softmax - one hot) / n, summing to zero per sample
+        loss.backward()
+        for sample_logits in logits:
+            self.assertAlmostEqual(sum(v.grad for v in sample_logits), 0.0, 9)
+        self.assertLess(logits[0][0].grad, 0)
+        self.assertLess(logits[1][2].grad, 0)
+
+        # Stable for large logits
+        loss = softmax_cross_entropy([Var(1)], [[Var(1000.0), Var(1001.0)]])
+        self.assertAlmostEqual(loss.data, math.log(1 + math.exp(-1)), 9)
+
+    def test_categorical_accuracy(self):
+        y_true = [Var(0), Var(2), Var(1)]
+        y_pred = [[0.9, 0.1, 0.0], [0.2, 0.3, 0.5], [0.6, 0.3, 0.1]]
+        self.assertAlmostEqual(categorical_accuracy(y_true, y_pred), 2 / 3, 9)
+
+        metric = CategoricalAccuracy()
+        metric.update(y_true[:1], y_pred[:1])
+        metric.update(y_true[1:], y_pred[1:])
+        self.assertAlmostEqual(metric.compute(), 2 / 3, 9)
+
+    def test_streaming_metrics(self):
+        y_true = [1, 1, 0, 0, 1]
+        y_pred = [0.9, 0.4, 0.6, 0.1, 0.8]
+        for metric, expected in [(BinaryAccuracy(), binary_accuracy(y_true, y_pred)),
+                                 (Precision(), precision(y_true, y_pred)),
+                                 (Recall(), recall(y_true, y_pred))]:
+            metric.update(y_true[:2], y_pred[:2])
+            metric.update(y_true[2:], y_pred[2:])
+            self.assertAlmostEqual(metric.compute(), expected, 6)
+
+            metric.reset()
+            self.assertEqual(metric.compute(), 0.0)
+
     def test_binary_accuracy(self):
         y_true = [Var(0), Var(1), Var(2), Var(3)]
         y_pred = [Var(0), Var(2), Var(1), Var(3)]
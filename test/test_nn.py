@@ -1,7 +1,8 @@
 import unittest
 
-from picograd.engine import Var
-from picograd.nn import Neuron, Layer, MLP
+from picograd.engine import Var, no_grad, topological_sort
+from picograd.nn import Module, Neuron, Layer, MLP, Embedding, Checkpoint
+from picograd.optim import Adam
 
 
 class TestNN(unittest.TestCase):
@@ -70,6 +71,184 @@ class TestNN(unittest.TestCase):
             for neuron in layer.neurons:
                 self.assertIs(neuron.activation, activation)
 
+    def test_predict(self):
+        inputs = [[0.5, -1.0], [2.0, 0.25], [-3.0, 1.5]]
+        for activation in ['linear', 'relu', 'tanh', 'sigmoid']:
+            model = MLP(in_features=2, layers=[4, 3], activations=[activation, activation])
+
+            # Grad-free path matches the graph-building forward pass
+            expected = [[out.data for out in model(list(map(Var, x)))] for x in inputs]
+            predictions = model.predict_batch(inputs)
+            self.assertEqual(len(predictions), len(inputs))
+            for prediction, expected_outs in zip(predictions, expected):
+                for out, expected_out in zip(prediction, expected_outs):
+                    self.assertAlmostEqual(out, expected_out, 9)
+            self.assertEqual(model.predict(inputs[0]), predictions[0])
+
+        neuron = Neuron(in_features=2, activation='unknown')
+        with self.assertRaises(NotImplementedError):
+            neuron.predict([1, 2])
+
+    def test_parameter_registry(self):
+        model = MLP(in_features=2, layers=[3, 1], activations=['relu', 'linear'])
+
+        named = model.named_parameters()
+        self.assertEqual(model.num_parameters(), 13)
+        self.assertEqual([p for _, p in named], model.parameters())
+        self.assertEqual(named[0], ('layers.0.neurons.0.w.0', model.layers[0].neurons[0].w[0]))
+        self.assertEqual(named[2], ('layers.0.neurons.0.b', model.layers[0].neurons[0].b))
+        self.assertEqual(named[-1], ('layers.1.neurons.0.b', model.layers[1].neurons[0].b))
+
+        # Flat view is cached between calls
+        self.assertIs(model.parameters(), model.parameters())
+
+        # Reassigning parameters of a submodule invalidates the cached view
+        neuron = model.layers[1].neurons[0]
+        neuron.b = Var(0.5)
+        self.assertIs(model.parameters()[-1], neuron.b)
+
+        for p in model.parameters():
+            p.grad = 1.0
+        model.zero_grad()
+        for p in model.parameters():
+            self.assertEqual(p.grad, 0.0)
+
+    def test_overridden_parameters(self):
+        class Affine(Module):
+            def __init__(self):
+                self.params = {"w": Var(2.0), "b": Var(1.0)}
+
+            def __call__(self, x):
+                return [self.params["w"] * x[0] + self.params["b"]]
+
+            def parameters(self):
+                return list(self.params.values())
+
+        class Model(Module):
+            def __init__(self):
+                self.affine = Affine()
+                self.head = Neuron(in_features=1)
+
+            def __call__(self, x):
+                return [self.head(self.affine(x))]
+
+        model = Model()
+        self.assertEqual(model.affine.named_parameters(), [('0', model.affine.params["w"]), ('1', model.affine.params["b"])])
+        self.assertEqual(model.named_parameters()[1], ('affine.1', model.affine.params["b"]))
+        self.assertEqual(model.num_parameters(), 4)
+
+        for p in model.parameters():
+            p.grad = 5.0
+        model.zero_grad()
+        self.assertEqual([p.grad for p in model.parameters()], [0.0] * 4)
+
+        model.affine.params["w"].grad = 5.0
+        model.affine.zero_grad()
+        self.assertEqual(model.affine.params["w"].grad, 0.0)
+
+    def test_embedding(self):
+        embedding = Embedding(num_embeddings=10, embedding_dim=3)
+        self.assertEqual(len(embedding.parameters()), 30)
+
+        rows = embedding([2, Var(7), 2])
+        self.assertEqual(len(rows), 3)
+        self.assertIs(rows[0], embedding.weight[2])
+        self.assertIs(rows[1], embedding.weight[7])
+
+        # Only looked up rows are touched and receive a gradient
+        self.assertEqual(len(embedding.touched_parameters()), 6)
+        out = sum([v for row in rows for v in row], 0.0)
+        out.backward()
+        for index, row in enumerate(embedding.weight):
+            for p in row:
+                self.assertEqual(p.grad, 2.0 if index == 2 else 1.0 if index == 7 else 0.0)
+
+        embedding.zero_grad()
+        self.assertEqual(len(embedding.touched_parameters()), 0)
+        for p in embedding.parameters():
+            self.assertEqual(p.grad, 0.0)
+
+        with self.assertRaises(AssertionError):
+            embedding([10])
+        with self.assertRaises(AssertionError):
+            embedding.predict_batch([[-1]])
+
+        # Grad-free lookups return row values
+        self.assertEqual(embedding.predict([1, 2]), [[v.data for v in embedding.weight[1]],
+                                                     [v.data for v in embedding.weight[2]]])
+        self.assertEqual(embedding.predict_batch([[3], [0, 9]])[1][1], [v.data for v in embedding.weight[9]])
+        self.assertEqual(len(embedding.touched_parameters()), 0)
+
+        # Lookups without graph are not tracked
+        with no_grad():
+            embedding([4])
+        self.assertEqual(len(embedding.touched_parameters()), 0)
+
+    def test_embedding_sparse_training(self):
+        class Model(Module):
+            def __init__(self):
+                self.embedding = Embedding(num_embeddings=1000, embedding_dim=2)
+                self.head = Layer(in_features=4, out_features=1)
+
+            def __call__(self, indices):
+                return self.head([v for row in self.embedding(indices) for v in row])
+
+        model = Model()
+        optimizer = Adam(model.parameters(), lr=0.1)
+        for step in range(50):
+            indices = [2 * step, 2 * step + 1]
+            before = [[v.data for v in row] for row in model.embedding.weight]
+
+            # Model.zero_grad resets the head in a flat pass and lets the embedding reset its touched rows
+            model.zero_grad()
+            loss = model(indices)[0] ** 2
+            loss.backward()
+            touched = model.embedding.touched_parameters()
+            self.assertEqual(len(touched), 4)
+            optimizer.sparse_step(model.head.parameters() + touched)
+
+            # Only the rows of the current batch are updated
+            changed = [ind for ind, row in enumerate(model.embedding.weight)
+                       if [v.data for v in row] != before[ind]]
+            self.assertEqual(changed, indices)
+
+    def test_checkpoint(self):
+        model = MLP(in_features=2, layers=[4, 4, 4, 1], activations=['tanh', 'relu', 'sigmoid', 'linear'])
+        x = [Var(0.5), Var(-1.5)]
+
+        loss = model(x)[0] ** 2
+        loss.backward()
+        expected_grads = [p.grad for p in model.parameters()] + [v.grad for v in x]
+        num_nodes = len(topological_sort([loss]))
+
+        model.zero_grad()
+        for v in x:
+            v.grad = 0.0
+        model.layers = [Checkpoint(layer) for layer in model.layers]
+        self.assertEqual(model.num_parameters(), len(expected_grads) - len(x))
+        self.assertEqual(model.named_parameters()[0][0], 'layers.0.module.neurons.0.w.0')
+
+        checkpointed_loss = model(x)[0] ** 2
+        self.assertAlmostEqual(checkpointed_loss.data, loss.data, 9)
+        # Intermediates of the segments are not kept alive by the graph
+        self.assertLess(len(topological_sort([checkpointed_loss])), num_nodes // 4)
+
+        checkpointed_loss.backward()
+        grads = [p.grad for p in model.parameters()] + [v.grad for v in x]
+        for grad, expected_grad in zip(grads, expected_grads):
+            self.assertAlmostEqual(grad, expected_grad, 9)
+
+        # The segments are recomputed with their graph even when backward runs under no_grad
+        model.zero_grad()
+        checkpointed_loss = model(x)[0] ** 2
+        with no_grad():
+            checkpointed_loss.backward()
+        for p, expected_grad in zip(model.parameters(), expected_grads):
+            self.assertAlmostEqual(p.grad, expected_grad, 9)
+
+        # Grad-free path goes through the wrapped segments
+        self.assertAlmostEqual(model.predict([0.5, -1.5])[0] ** 2, loss.data, 9)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,7 +1,7 @@
 import unittest
 
 from picograd.engine import Var
-from picograd.optim import SGD, Adam
+from picograd.optim import SGD, Adam, StepLR, CosineAnnealingLR, LinearWarmup, ReduceLROnPlateau
 
 
 class TestOptimizer(unittest.TestCase):
@@ -57,6 +57,69 @@ class TestOptimizer(unittest.TestCase):
         for _, p in enumerate(params):
             self.assertEqual(p.grad, 0)
 
+    def test_sparse_sgd(self):
+        params = [Var(3), Var(-1), Var(0.5)]
+        sgd = SGD(parameters=params, lr=0.1)
+
+        for p in params:
+            p.grad = 1
+
+        # Only the given parameters are updated
+        sgd.sparse_step([params[2], params[0]])
+        self.assertEqual(params[0].data, 2.9)
+        self.assertEqual(params[1].data, -1)
+        self.assertEqual(params[2].data, 0.4)
+
+    def test_lazy_adam(self):
+        params = [Var(3), Var(-1), Var(0.5)]
+        adam = Adam(parameters=params, lr=1e-3)
+
+        for p in params:
+            p.grad = 1
+
+        adam.sparse_step([params[1]])
+        self.assertEqual(params[0].data, 3)
+        self.assertAlmostEqual(params[1].data, -1.001, 6)
+        self.assertEqual(params[2].data, 0.5)
+
+        # Moment estimates of untouched parameters are left as is
+        self.assertEqual(adam._exp_avg[0], 0)
+        self.assertEqual(adam._exp_avg_sq[2], 0)
+
+    def test_lr_schedulers(self):
+        sgd = SGD(parameters=[Var(1)], lr=1.0)
+        scheduler = StepLR(sgd, step_size=2, gamma=0.5)
+        lrs = [sgd.lr]
+        for _ in range(4):
+            scheduler.step()
+            lrs.append(sgd.lr)
+        self.assertEqual(lrs, [1.0, 1.0, 0.5, 0.5, 0.25])
+
+        adam = Adam(parameters=[Var(1)], lr=1.0)
+        scheduler = CosineAnnealingLR(adam, t_max=2, eta_min=0.1)
+        self.assertEqual(adam.lr, 1.0)
+        scheduler.step()
+        self.assertAlmostEqual(adam.lr, 0.55, 6)
+        scheduler.step()
+        scheduler.step()
+        self.assertAlmostEqual(adam.lr, 0.1, 6)
+
+        sgd = SGD(parameters=[Var(1)], lr=1.0)
+        scheduler = LinearWarmup(sgd, warmup_epochs=4)
+        lrs = [sgd.lr]
+        for _ in range(4):
+            scheduler.step()
+            lrs.append(sgd.lr)
+        self.assertEqual(lrs, [0.25, 0.5, 0.75, 1.0, 1.0])
+
+        sgd = SGD(parameters=[Var(1)], lr=1.0)
+        scheduler = ReduceLROnPlateau(sgd, factor=0.5, patience=1)
+        lrs = []
+        for loss in [3, 2, 2, 2, 2, 1]:
+            scheduler.step(loss)
+            lrs.append(sgd.lr)
+        self.assertEqual(lrs, [1.0, 1.0, 1.0, 0.5, 0.5, 0.5])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,135 @@
+import asyncio
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from picograd.nn import MLP
+from picograd.serving import BatchPredictor, AsyncBatchPredictor, ServingStats, run_synthetic_load
+
+
+class TestServing(unittest.TestCase):
+    def test_batch_predictor(self):
+        model = MLP(in_features=2, layers=[8, 1], activations=['relu', 'sigmoid'])
+        inputs = [[i / 10, 1 - i / 20] for i in range(64)]
+        expected = model.predict_batch(inputs)
+
+        with BatchPredictor(model, max_batch_size=16, max_wait=0.01) as predictor:
+            # Concurrent single-sample requests from many threads
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                predictions = list(pool.map(predictor.predict, inputs))
+            self.assertEqual(predictions, expected)
+            self.assertEqual(predictor.stats.num_requests, len(inputs))
+
+            # Requests queued together are served in coalesced batches
+            num_batches = predictor.stats.num_batches
+            futures = [predictor.submit(x) for x in inputs]
+            self.assertEqual([f.result() for f in futures], expected)
+            self.assertLess(predictor.stats.num_batches - num_batches, len(inputs) // 4)
+
+        with self.assertRaises(RuntimeError):
+            predictor.submit(inputs[0])
+
+    def test_batch_predictor_errors(self):
+        model = MLP(in_features=2, layers=[1], activations=['unknown'])
+        with BatchPredictor(model) as predictor:
+            with self.assertRaises(NotImplementedError):
+                predictor.predict([1, 2])
+
+        # A malformed request fails alone, not the requests batched with it
+        model = MLP(in_features=2, layers=[1], activations=['linear'])
+        with BatchPredictor(model, max_batch_size=8, max_wait=0.05) as predictor:
+            futures = [predictor.submit([1.0, 2.0]), predictor.submit([1.0, "x"]), predictor.submit([3.0, 4.0])]
+            self.assertEqual(futures[0].result(), model.predict([1.0, 2.0]))
+            with self.assertRaises(TypeError):
+                futures[1].result()
+            self.assertEqual(futures[2].result(), model.predict([3.0, 4.0]))
+            self.assertEqual(predictor.stats.num_requests, 2)
+
+    def test_async_batch_predictor(self):
+        model = MLP(in_features=2, layers=[8, 1], activations=['tanh', 'linear'])
+        inputs = [[i / 10, 1 - i / 20] for i in range(100)]
+        expected = model.predict_batch(inputs)
+
+        async def serve():
+            async with AsyncBatchPredictor(model, max_batch_size=8, max_latency=0.005) as predictor:
+                return await run_synthetic_load(predictor, inputs, concurrency=16)
+
+        result = asyncio.run(serve())
+        self.assertEqual(result["predictions"], expected)
+
+        stats = result["stats"]
+        self.assertEqual(stats["requests"], len(inputs))
+        self.assertGreater(stats["mean_batch_size"], 1)  # concurrent requests are coalesced
+        self.assertLessEqual(stats["mean_batch_size"], 8)
+        self.assertGreater(stats["throughput"], 0)
+        self.assertLessEqual(stats["latency_p50"], stats["latency_p95"])
+
+        async def predict_stopped():
+            await AsyncBatchPredictor(model).predict(inputs[0])
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(predict_stopped())
+
+        async def predict_while_stopping():
+            predictor = AsyncBatchPredictor(model)
+            await predictor.start()
+            stopping = asyncio.ensure_future(predictor.stop())
+            await asyncio.sleep(0)  # stop() is now waiting for the worker
+            try:
+                with self.assertRaises(RuntimeError):
+                    await asyncio.wait_for(predictor.predict(inputs[0]), timeout=1)
+            finally:
+                await stopping
+
+        asyncio.run(predict_while_stopping())
+
+    def test_async_batch_predictor_errors(self):
+        model = MLP(in_features=2, layers=[1], activations=['linear'])
+
+        async def serve():
+            async with AsyncBatchPredictor(model, max_batch_size=8, max_latency=0.05) as predictor:
+                return await asyncio.gather(predictor.predict([1.0, 2.0]), predictor.predict([1.0, "x"]),
+                                            predictor.predict([3.0, 4.0]), return_exceptions=True)
+
+        valid, malformed, other = asyncio.run(serve())
+        # A malformed request fails alone, not the requests batched with it
+        self.assertEqual(valid, model.predict([1.0, 2.0]))
+        self.assertIsInstance(malformed, TypeError)
+        self.assertEqual(other, model.predict([3.0, 4.0]))
+
+    def test_async_batch_predictor_does_not_block(self):
+        class SlowModel(MLP):
+            def predict_batch(self, xs):
+                time.sleep(0.2)
+                return super().predict_batch(xs)
+
+        model = SlowModel(in_features=2, layers=[1], activations=['linear'])
+
+        async def serve():
+            async with AsyncBatchPredictor(model, max_latency=0) as predictor:
+                predicting = asyncio.ensure_future(predictor.predict([1.0, 2.0]))
+                # Other coroutines keep running while the batch is computed
+                start = time.perf_counter()
+                await asyncio.sleep(0.01)
+                waited = time.perf_counter() - start
+                return await predicting, waited
+
+        prediction, waited = asyncio.run(serve())
+        self.assertEqual(prediction, model.predict([1.0, 2.0]))
+        self.assertLess(waited, 0.15)
+
+    def test_serving_stats(self):
+        stats = ServingStats()
+        self.assertEqual(stats.summary()["latency_p99"], 0.0)
+
+        stats.record_batch([0.0, 1.0], served=2.0)
+        stats.record_batch([3.0], served=4.0)
+        self.assertEqual(stats.num_requests, 3)
+        self.assertEqual(stats.mean_batch_size, 1.5)
+        self.assertEqual(stats.throughput, 0.75)
+        self.assertEqual(stats.latency_percentile(50), 1.0)
+        self.assertEqual(stats.latency_percentile(100), 2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,12 @@
 import unittest
 
 from picograd.engine import Var
-from picograd.nn import MLP
-from picograd.optim import SGD
-from picograd.metrics import mean_squared_error, binary_accuracy
+from picograd.nn import MLP, Module, Embedding, Neuron
+from picograd.optim import SGD, Adam, StepLR
+from picograd.metrics import mean_squared_error, binary_accuracy, BinaryAccuracy, softmax_cross_entropy, \
+    categorical_accuracy, precision, recall, roc_auc, Precision, Recall
 from picograd.data import BatchIterator
-from picograd.trainer import Trainer, History
+from picograd.trainer import Trainer, History, EarlyStopping
 
 
 class TestTrainer(unittest.TestCase):
@@ -36,6 +37,112 @@ class TestTrainer(unittest.TestCase):
         self.assertLess(loss, 0.1)
         self.assertEqual(acc, 1.0)  # 100%
 
+    def test_trainer_streaming_metric(self):
+        x_train = [
+            list(map(Var, x)) for x in [[0, 0], [0, 1], [1, 0], [1, 1]]
+        ]
+        y_train = [Var(0), Var(0), Var(0), Var(1)]
+
+        model = MLP(in_features=2, layers=[1], activations=['linear'])
+        optimizer = SGD(model.parameters(), lr=0.05)
+        data_iterator = BatchIterator(x_train, y_train, batch_size=1)
+
+        metric = BinaryAccuracy()
+        trainer = Trainer(model, optimizer, loss=mean_squared_error, acc_metric=metric)
+        history: History = trainer.fit(data_iterator, num_epochs=100)
+        self.assertIs(trainer.acc_metric, metric)
+        self.assertEqual(metric.n_total, len(y_train))  # reset at every epoch
+        self.assertIn(history["acc"][-1], [0.0, 0.25, 0.5, 0.75, 1.0])  # averaged over samples, not batches
+
+        # Metric functions which are not averages over samples are accumulated through their streaming classes
+        trainer = Trainer(model, optimizer, loss=mean_squared_error, acc_metric=precision)
+        self.assertIsInstance(trainer.acc_metric, Precision)
+        self.assertIsInstance(Trainer(model, optimizer, loss=mean_squared_error, acc_metric=recall).acc_metric, Recall)
+        history = trainer.fit(data_iterator, num_epochs=1)
+        self.assertEqual(history["acc"], [trainer.acc_metric.compute()])
+        with self.assertRaises(AssertionError):
+            Trainer(model, optimizer, loss=mean_squared_error, acc_metric=roc_auc)
+
+    def test_trainer_validation_and_early_stopping(self):
+        x_train = [
+            list(map(Var, x)) for x in [[0, 0], [0, 1], [1, 0], [1, 1]]
+        ]
+        y_train = [Var(0), Var(0), Var(0), Var(1)]
+
+        model = MLP(in_features=2, layers=[1], activations=['linear'])
+        optimizer = SGD(model.parameters(), lr=0.1)
+        data_iterator = BatchIterator(x_train, y_train)
+
+        early_stopping = EarlyStopping(monitor="val_loss", patience=2, min_delta=1e-3)
+        trainer = Trainer(model, optimizer, loss=mean_squared_error, acc_metric=binary_accuracy)
+        history: History = trainer.fit(data_iterator, num_epochs=500, validation_data=data_iterator,
+                                       early_stopping=early_stopping, lr_scheduler=StepLR(optimizer, step_size=100))
+
+        # Training stopped once the validation loss plateaued, well before the maximum number of epochs
+        num_epochs = len(history["loss"])
+        self.assertLess(num_epochs, 500)
+        self.assertEqual(len(history["val_loss"]), num_epochs)
+        self.assertEqual(len(history["val_acc"]), num_epochs)
+        self.assertEqual(len(history["lr"]), num_epochs)
+        self.assertEqual(num_epochs, early_stopping.best_epoch + 1 + early_stopping.patience)
+
+        # Best parameters are restored and the validation pass did not touch gradients
+        val_loss, _ = trainer.evaluate(data_iterator)
+        self.assertAlmostEqual(val_loss, early_stopping.best, 6)
+        self.assertLessEqual(early_stopping.best - min(history["val_loss"]), early_stopping.min_delta)
+        for p in model.parameters():
+            p.grad = 0.0
+        trainer.evaluate(data_iterator)
+        for p in model.parameters():
+            self.assertEqual(p.grad, 0.0)
+
+        # Stops after patience epochs without improvement, at least one (patience=0 behaves as patience=1)
+        for patience in [0, 1, 3]:
+            early_stopping = EarlyStopping(monitor="loss", patience=patience)
+            history = {"loss": []}
+            stopped = []
+            for loss in [1.0, 0.5, 0.5, 0.5, 0.5, 0.5]:
+                history["loss"].append(loss)
+                stopped.append(early_stopping.update(history, model))
+            self.assertEqual(stopped.index(True), 1 + max(patience, 1))
+
+    def test_trainer_embedding(self):
+        class Model(Module):
+            def __init__(self):
+                self.embedding = Embedding(num_embeddings=100, embedding_dim=2)
+                self.head = Neuron(in_features=2)
+
+            def __call__(self, x):
+                return [self.head(self.embedding(x)[0])]
+
+        model = Model()
+        trainer = Trainer(model, SGD(model.parameters(), lr=0.1), loss=mean_squared_error, acc_metric=binary_accuracy)
+        trainer.fit(BatchIterator([[Var(i)] for i in range(4)], [Var(i % 2) for i in range(4)]), num_epochs=2)
+        trainer.fit(BatchIterator([[Var(i)] for i in range(4, 8)], [Var(i % 2) for i in range(4)]), num_epochs=1)
+
+        # The model resets the embedding at every epoch, so only the rows of the last epoch are touched
+        self.assertEqual(model.embedding.touched_parameters(),
+                         [p for row in model.embedding.weight[4:8] for p in row])
+
+    def test_trainer_multiclass(self):
+        # 3 classes, one per quadrant direction
+        x_train = [
+            list(map(Var, x)) for x in [[1, 0], [0.8, 0.2], [0, 1], [0.2, 0.9], [-1, -1], [-0.8, -0.9]]
+        ]
+        y_train = [Var(0), Var(0), Var(1), Var(1), Var(2), Var(2)]
+
+        model = MLP(in_features=2, layers=[3], activations=['linear'])  # Softmax regression
+        optimizer = Adam(model.parameters(), lr=0.1)
+        data_iterator = BatchIterator(x_train, y_train)
+
+        # A single model trains all classes at once, predictions are per-sample output vectors
+        trainer = Trainer(model, optimizer, loss=softmax_cross_entropy, acc_metric=categorical_accuracy)
+        history: History = trainer.fit(data_iterator, num_epochs=100, validation_data=data_iterator)
+
+        self.assertLess(history["loss"][-1], history["loss"][0])
+        self.assertEqual(history["acc"][-1], 1.0)
+        self.assertEqual(history["val_acc"][-1], 1.0)
+
 
 if __name__ == "__main__":
     unittest.main()